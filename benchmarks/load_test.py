@@ -0,0 +1,280 @@
+"""Load test for the medical_scribe HTTP service.
+
+Generates synthetic recordings of configurable lengths, submits them
+concurrently to /process-audio, waits for every job to finish and writes a JSON
+report with p50/p95/p99 latencies, failures and throughput.
+
+By default the app runs in-process against the mock Ollama server
+(mock_ollama.py: fixed latency, token rate and load delay, canned note), so
+results are reproducible offline and only reflect the scribe itself. Pass --url
+to load-test a running server (start it with OLLAMA_HOSTS pointing at a mock
+for the same effect).
+
+    python benchmarks/load_test.py --requests 20 --concurrency 4 --durations 30,120
+    python benchmarks/load_test.py --baseline benchmarks/results/previous.json
+"""
+import argparse
+import io
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+import wave
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import List, Optional
+import numpy as np
+import requests
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "../medical_scribe"))
+from mock_ollama import serve as serve_mock_ollama
+
+SAMPLE_RATE = 16000
+
+def synthesize_audio(seconds: float, seed: int) -> bytes:
+    """A 16 kHz mono WAV of speech-like bursts (voiced tones with pauses) over low noise.
+
+    Every seed gives different audio, so runs do not hit the transcript cache.
+    """
+    rng = np.random.default_rng(seed)
+    total = int(seconds * SAMPLE_RATE)
+    audio = rng.normal(0, 0.003, total).astype(np.float32)
+
+    position = 0
+    while position < total:
+        length = int(rng.uniform(0.15, 0.5) * SAMPLE_RATE)
+        end = min(position + length, total)
+        t = np.arange(end - position) / SAMPLE_RATE
+        pitch = rng.uniform(90, 250)
+        syllable = sum(np.sin(2 * np.pi * pitch * harmonic * t) / harmonic for harmonic in range(1, 5))
+        envelope = np.sin(np.pi * np.linspace(0, 1, end - position))
+        audio[position:end] += (0.1 * syllable * envelope).astype(np.float32)
+        position = end + int(rng.uniform(0.05, 0.6) * SAMPLE_RATE)
+
+    pcm = (np.clip(audio, -1, 1) * 32767).astype(np.int16)
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(SAMPLE_RATE)
+        f.writeframes(pcm.tobytes())
+    return buffer.getvalue()
+
+def start_local_server(upload_folder: Path, whisper_model: str, ollama_host: str):
+    """Run the app in this process on a free port; returns (base url, server)."""
+    from werkzeug.serving import make_server
+    from config import Config
+
+    Config.UPLOAD_FOLDER = str(upload_folder)
+    Config.JOB_STATE_DIR = str(upload_folder / 'jobs')
+    Config.WHISPER_MODEL = whisper_model
+    Config.OLLAMA_HOSTS = [ollama_host]
+    # Every request should pay for transcription and note generation
+    Config.TRANSCRIPT_CACHE_ENABLED = False
+    Config.NOTE_CACHE_ENABLED = False
+    Config.RETENTION_ENABLED = False
+
+    from app import create_app
+    server = make_server('127.0.0.1', 0, create_app(Config), threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}", server
+
+def run_request(base_url: str, audio: bytes, audio_s: float, args) -> dict:
+    """Submit one recording and wait for its job; returns the request's measurements."""
+    result = {'audio_s': audio_s, 'ok': False, 'error': None}
+    started = time.perf_counter()
+    try:
+        response = requests.post(
+            f"{base_url}/process-audio",
+            files={'audio': ('benchmark.wav', audio, 'audio/wav')},
+            data={'model': args.model, 'whisper_model': args.whisper_model, 'strategy': args.strategy},
+            timeout=args.timeout
+        )
+        result['submit_s'] = time.perf_counter() - started
+        if response.status_code != 202:
+            result['error'] = f"submit returned {response.status_code}: {response.text[:200]}"
+            return result
+
+        result_url = f"{base_url}{response.json()['resultUrl']}"
+        deadline = started + args.timeout
+        while time.perf_counter() < deadline:
+            response = requests.get(result_url, timeout=args.timeout)
+            if response.status_code == 200:
+                body = response.json()
+                result['ok'] = True
+                result['total_s'] = time.perf_counter() - started
+                timings = body.get('timings') or {}
+                for name in ('decode_s', 'inference_s', 'real_time_factor', 'skipped_s'):
+                    if timings.get(name) is not None:
+                        result[name] = timings[name]
+                return result
+            if response.status_code != 202:
+                result['error'] = f"job returned {response.status_code}: {response.text[:200]}"
+                return result
+            time.sleep(args.poll_interval)
+        result['error'] = 'timed out waiting for the job'
+    except requests.RequestException as e:
+        result['error'] = str(e)
+    return result
+
+def summarize(values: List[float]) -> Optional[dict]:
+    if not values:
+        return None
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {
+        'count': len(values),
+        'mean': round(float(np.mean(values)), 4),
+        'p50': round(float(p50), 4),
+        'p95': round(float(p95), 4),
+        'p99': round(float(p99), 4),
+        'max': round(float(np.max(values)), 4)
+    }
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def build_report(results: List[dict], wall_s: float, args, target: str) -> dict:
+    succeeded = [r for r in results if r['ok']]
+    errors = {}
+    for r in results:
+        if not r['ok']:
+            errors[r['error']] = errors.get(r['error'], 0) + 1
+
+    return {
+        'commit': git_commit(),
+        'createdAt': datetime.now().isoformat(timespec='seconds'),
+        'config': {
+            'target': target,
+            'requests': args.requests,
+            'concurrency': args.concurrency,
+            'durations': args.durations,
+            'model': args.model,
+            'whisper_model': args.whisper_model,
+            'strategy': args.strategy,
+            'llm': None if target != 'local' else args.ollama_url or {
+                'latency': args.llm_latency,
+                'tokens_per_second': args.llm_tokens_per_second,
+                'load_delay': args.llm_load_delay
+            }
+        },
+        'wall_s': round(wall_s, 3),
+        'succeeded': len(succeeded),
+        'failed': len(results) - len(succeeded),
+        'errors': errors,
+        'throughput': {
+            'jobs_per_minute': round(60 * len(succeeded) / wall_s, 3) if wall_s else None,
+            'audio_s_per_wall_s': round(sum(r['audio_s'] for r in succeeded) / wall_s, 3) if wall_s else None
+        },
+        'latency': {
+            name: summarize([r[name] for r in succeeded if name in r])
+            for name in ('submit_s', 'total_s', 'decode_s', 'inference_s', 'real_time_factor', 'skipped_s')
+        }
+    }
+
+def compare_reports(report: dict, baseline: dict, tolerance: float) -> List[str]:
+    """Latency percentiles and throughput that got worse than the baseline by more than ``tolerance``."""
+    regressions = []
+    for name, summary in report['latency'].items():
+        before = baseline.get('latency', {}).get(name)
+        if not summary or not before:
+            continue
+        for percentile in ('p50', 'p95', 'p99'):
+            if before[percentile] and summary[percentile] > before[percentile] * (1 + tolerance):
+                regressions.append(f"{name} {percentile}: {before[percentile]:.3f} -> {summary[percentile]:.3f}")
+
+    for name, value in report['throughput'].items():
+        before = baseline.get('throughput', {}).get(name)
+        if before and value is not None and value < before * (1 - tolerance):
+            regressions.append(f"{name}: {before:.3f} -> {value:.3f}")
+
+    if report['failed'] > baseline.get('failed', 0):
+        regressions.append(f"failed: {baseline.get('failed', 0)} -> {report['failed']}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent /process-audio load test")
+    parser.add_argument("--url", help="Base URL of a running server (default: run the app in-process with a mock LLM)")
+    parser.add_argument("--requests", type=int, default=10, help="Total number of recordings to submit")
+    parser.add_argument("--concurrency", type=int, default=4, help="Recordings in flight at once")
+    parser.add_argument("--durations", default="30,120", help="Comma-separated recording lengths in seconds, cycled")
+    parser.add_argument("--model", default="llama3.1:8b", help="LLM model name sent with each request")
+    parser.add_argument("--whisper_model", default="tiny", help="Whisper model size")
+    parser.add_argument("--strategy", default="refine", help="Note generation strategy")
+    parser.add_argument("--ollama_url", help="Ollama (or mock) server for the in-process app (default: start a mock)")
+    parser.add_argument("--llm_latency", type=float, default=0.5, help="Mock LLM seconds before the first token")
+    parser.add_argument("--llm_tokens_per_second", type=float, default=200.0, help="Mock LLM generation speed")
+    parser.add_argument("--llm_load_delay", type=float, default=2.0, help="Mock LLM cold model load time")
+    parser.add_argument("--timeout", type=float, default=900.0, help="Seconds to wait for a single job")
+    parser.add_argument("--poll_interval", type=float, default=0.5, help="Seconds between result polls")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the synthetic recordings")
+    parser.add_argument("--output", help="Report path (default: benchmarks/results/load_test_<time>.json)")
+    parser.add_argument("--baseline", help="Earlier report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="Allowed relative regression against the baseline")
+    args = parser.parse_args()
+
+    durations = [float(value) for value in args.durations.split(',')]
+    print(f"Synthesizing {args.requests} recordings ({args.durations} s)")
+    recordings = [
+        (synthesize_audio(durations[i % len(durations)], args.seed + i), durations[i % len(durations)])
+        for i in range(args.requests)
+    ]
+
+    results_dir = Path(os.path.dirname(os.path.abspath(__file__))) / "results"
+    if args.url:
+        base_url, server, target = args.url.rstrip('/'), None, args.url
+    else:
+        ollama_host = args.ollama_url
+        if not ollama_host:
+            mock = serve_mock_ollama(
+                port=0,
+                latency=args.llm_latency,
+                tokens_per_second=args.llm_tokens_per_second,
+                load_delay=args.llm_load_delay
+            )
+            ollama_host = f"http://127.0.0.1:{mock.server_port}"
+        upload_folder = results_dir / "uploads"
+        upload_folder.mkdir(parents=True, exist_ok=True)
+        base_url, server = start_local_server(upload_folder, args.whisper_model, ollama_host)
+        target = 'local'
+    print(f"Running {args.requests} requests against {base_url} with concurrency {args.concurrency}")
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        results = list(executor.map(lambda recording: run_request(base_url, *recording, args), recordings))
+    wall_s = time.perf_counter() - started
+
+    if server is not None:
+        server.shutdown()
+
+    report = build_report(results, wall_s, args, target)
+    output = Path(args.output) if args.output else results_dir / f"load_test_{datetime.now():%Y%m%d_%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+
+    print(f"\n{report['succeeded']} succeeded, {report['failed']} failed in {wall_s:.1f}s")
+    for name, summary in report['latency'].items():
+        if summary:
+            print(f"{name:<18} p50 {summary['p50']:>8.3f}  p95 {summary['p95']:>8.3f}  p99 {summary['p99']:>8.3f}")
+    for error, count in report['errors'].items():
+        print(f"  {count}x {error}")
+    print(f"Report written to {output}")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            regressions = compare_reports(report, json.load(f), args.tolerance)
+        if regressions:
+            print("\nRegressions against the baseline:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print("No regressions against the baseline")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,373 @@
+"""A local stand-in for the Ollama server, for deterministic offline benchmarks.
+
+Speaks the parts of the Ollama HTTP API the project uses: /api/chat and
+/api/generate (streamed as NDJSON or not, with ``context`` on generate),
+/api/tags, /api/ps, /api/show and /api/version. Replies are canned or
+templated text chosen by regex rules over the prompt; timing follows a simple
+model of a real server:
+
+- ``load_delay`` the first time a model is used (or after its keep_alive expires)
+- ``latency`` plus prompt tokens at ``prompt_tokens_per_second`` before the first token
+  (tokens already in a passed ``context`` are not re-evaluated)
+- one token every 1 / ``tokens_per_second`` seconds after that
+
+Everything is deterministic, so two runs of the same workload produce the same
+output and, up to scheduling noise, the same timings.
+
+    python benchmarks/mock_ollama.py --port 11435 --tokens_per_second 50
+    OLLAMA_HOSTS=http://127.0.0.1:11435 python medical_scribe/run.py
+
+Rules file (JSON list, first match wins; ``$model``, ``$prompt_tokens`` and
+``$request`` are substituted into the response):
+
+    [{"match": "evaluate the SOAP note", "response": "Clinical Accuracy: [4] ..."},
+     {"match": ".*", "response_file": "notes/data/example_note.txt"}]
+"""
+import argparse
+import json
+import re
+import threading
+import time
+import zlib
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from string import Template
+from typing import List, Optional, Tuple
+
+DEFAULT_NOTE = """**Patient information**
+$model benchmark patient, 45-year-old.
+
+**Chief complaint**
+Right ankle pain after a fall.
+
+**History of present illness**
+Twisted the right ankle two weeks ago; able to weight bear with pain.
+
+**Physical examination**
+Swelling over the lateral malleolus, neurovascularly intact.
+
+**Assessment**
+Right ankle sprain.
+
+**Plan**
+Air cast boot, weight bearing as tolerated, follow-up in 2 weeks."""
+
+DEFAULT_RULES = [
+    {
+        'match': r'evaluate the SOAP note',
+        'response': ("Clinical Accuracy: [4]\nCompleteness: [4]\nConciseness: [4]\n"
+                     "Clarity: [4]\nHallucination: [No]")
+    },
+    {
+        'match': r'interview transcript',
+        'response': ("Good morning, I'm Dr. Lee. What brings you in today? I fell off a ladder and hurt my wrist. "
+                     "Can you show me where it hurts? Right here, and it's swollen. The X-ray shows a distal "
+                     "radius fracture, so we'll put you in a cast and see you in two weeks. Thank you, doctor.")
+    },
+    {
+        'match': r'Physical Exam Findings',
+        'response': ("1. Patient Demographics and History:\n- 52-year-old teacher, no prior surgery\n\n"
+                     "2. Physical Exam Findings:\n- Swelling and tenderness over the injury\n\n"
+                     "3. Imaging Findings:\n- Non-displaced fracture\n\n"
+                     "4. Assessment and Plan:\n- Cast immobilization, follow-up in 2 weeks\n\n"
+                     "5. Patient Questions:\n- When can I return to work?")
+    },
+    {'match': r'', 'response': DEFAULT_NOTE}
+]
+
+TOKEN_PATTERN = re.compile(r'\w+|[^\w\s]')
+PIECE_PATTERN = re.compile(r'\S+\s*|\s+')
+
+def count_tokens(text: str) -> int:
+    return len(TOKEN_PATTERN.findall(text or ''))
+
+def token_ids(text: str) -> List[int]:
+    """Stable fake token ids, so ``context`` round-trips like a real one."""
+    return [zlib.crc32(token.encode('utf-8')) % 32000 for token in TOKEN_PATTERN.findall(text or '')]
+
+def parse_keep_alive(value, default: float) -> float:
+    """Ollama keep_alive (seconds or a duration like '30m'; negative keeps the model forever) in seconds."""
+    if value is None:
+        return default
+    if isinstance(value, (int, float)):
+        return float('inf') if value < 0 else float(value)
+    match = re.fullmatch(r'(-?\d+(?:\.\d+)?)\s*(ms|s|m|h)?', str(value).strip())
+    if not match:
+        return default
+    amount = float(match.group(1))
+    if amount < 0:
+        return float('inf')
+    return amount * {'ms': 0.001, 's': 1, 'm': 60, 'h': 3600, None: 1}[match.group(2)]
+
+class MockOllama:
+    """Model state and reply generation shared by all request threads."""
+
+    def __init__(self, latency: float = 0.2, tokens_per_second: float = 50.0,
+                 prompt_tokens_per_second: float = 1000.0, load_delay: float = 2.0,
+                 keep_alive: float = 300.0, rules: Optional[list] = None, models: Optional[List[str]] = None):
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.prompt_tokens_per_second = prompt_tokens_per_second
+        self.load_delay = load_delay
+        self.keep_alive = keep_alive
+        self.models = models
+        self.rules = [
+            {**rule, 'pattern': re.compile(rule.get('match', ''), re.IGNORECASE)}
+            for rule in (rules or DEFAULT_RULES)
+        ]
+        self._loaded = {}  # model -> expiry timestamp
+        self._load_locks = {}
+        self._lock = threading.Lock()
+        self._requests = 0
+
+    def knows(self, model: str) -> bool:
+        return not self.models or model in self.models
+
+    def loaded_models(self) -> List[Tuple[str, float]]:
+        now = time.time()
+        with self._lock:
+            return [(model, expiry) for model, expiry in self._loaded.items() if expiry > now]
+
+    def ensure_loaded(self, model: str, keep_alive) -> float:
+        """Load the model if it is cold and refresh its expiry; returns the load time."""
+        keep_alive = parse_keep_alive(keep_alive, self.keep_alive)
+        with self._lock:
+            load_lock = self._load_locks.setdefault(model, threading.Lock())
+
+        load_duration = 0.0
+        with load_lock:
+            with self._lock:
+                warm = self._loaded.get(model, 0) > time.time()
+            if not warm and keep_alive > 0:
+                time.sleep(self.load_delay)
+                load_duration = self.load_delay
+            with self._lock:
+                if keep_alive > 0:
+                    self._loaded[model] = time.time() + keep_alive
+                else:
+                    self._loaded.pop(model, None)
+        return load_duration
+
+    def render(self, model: str, prompt: str, prompt_tokens: int) -> str:
+        with self._lock:
+            self._requests += 1
+            request = self._requests
+        for rule in self.rules:
+            if rule['pattern'].search(prompt):
+                if 'response_file' in rule:
+                    with open(rule['response_file'], 'r', encoding='utf-8') as f:
+                        text = f.read()
+                else:
+                    text = rule.get('response', '')
+                return Template(text).safe_substitute(model=model, prompt_tokens=prompt_tokens, request=request)
+        return ''
+
+    def reply(self, model: str, prompt_text: str, evaluated_text: str, options: Optional[dict], keep_alive):
+        """Yield (piece, final stats or None); sleeps to follow the timing model."""
+        started = time.perf_counter()
+        load_duration = self.ensure_loaded(model, keep_alive)
+
+        prompt_eval_count = count_tokens(evaluated_text)
+        prompt_started = time.perf_counter()
+        prompt_time = self.latency
+        if self.prompt_tokens_per_second > 0:
+            prompt_time += prompt_eval_count / self.prompt_tokens_per_second
+        time.sleep(prompt_time)
+        prompt_eval_duration = time.perf_counter() - prompt_started
+
+        text = self.render(model, prompt_text, prompt_eval_count)
+        pieces = PIECE_PATTERN.findall(text)
+        limit = (options or {}).get('num_predict')
+        done_reason = 'stop'
+        if limit is not None and 0 <= limit < len(pieces):
+            pieces = pieces[:limit]
+            done_reason = 'length'
+
+        delay = 1 / self.tokens_per_second if self.tokens_per_second > 0 else 0
+        eval_started = time.perf_counter()
+        for piece in pieces:
+            time.sleep(delay)
+            yield piece, None
+
+        yield '', {
+            'done': True,
+            'done_reason': done_reason,
+            'total_duration': int((time.perf_counter() - started) * 1e9),
+            'load_duration': int(load_duration * 1e9),
+            'prompt_eval_count': prompt_eval_count,
+            'prompt_eval_duration': int(prompt_eval_duration * 1e9),
+            'eval_count': len(pieces),
+            'eval_duration': int((time.perf_counter() - eval_started) * 1e9),
+            'text': ''.join(pieces)
+        }
+
+def now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat().replace('+00:00', 'Z')
+
+class MockOllamaHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    mock: MockOllama = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, payload: dict, status: int = 200):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _start_stream(self):
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+
+    def _write_chunk(self, payload: Optional[dict]):
+        data = (json.dumps(payload) + '\n').encode('utf-8') if payload is not None else b''
+        self.wfile.write(f"{len(data):x}\r\n".encode('ascii') + data + b"\r\n")
+        self.wfile.flush()
+
+    def do_GET(self):
+        if self.path == '/':
+            body = b'Ollama is running'
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        elif self.path == '/api/version':
+            self._send_json({'version': '0.0.0-mock'})
+        elif self.path == '/api/tags':
+            self._send_json({'models': [
+                {'name': model, 'model': model, 'modified_at': now_iso(), 'size': 0, 'digest': 'mock', 'details': {}}
+                for model in (self.mock.models or [model for model, _ in self.mock.loaded_models()])
+            ]})
+        elif self.path == '/api/ps':
+            self._send_json({'models': [
+                {'name': model, 'model': model, 'size': 0, 'digest': 'mock', 'details': {},
+                 'expires_at': datetime.fromtimestamp(min(expiry, 4e9), timezone.utc).isoformat()}
+                for model, expiry in self.mock.loaded_models()
+            ]})
+        else:
+            self._send_json({'error': 'not found'}, 404)
+
+    def do_POST(self):
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+            body = json.loads(self.rfile.read(length) or b'{}')
+        except ValueError:
+            self._send_json({'error': 'invalid JSON body'}, 400)
+            return
+
+        if self.path == '/api/show':
+            self._send_json({'modelfile': '', 'parameters': '', 'template': '', 'details': {}, 'model_info': {}})
+        elif self.path in ('/api/chat', '/api/generate'):
+            self._complete(self.path == '/api/chat', body)
+        else:
+            self._send_json({'error': 'not found'}, 404)
+
+    def _complete(self, is_chat: bool, body: dict):
+        model = body.get('model', '')
+        if not self.mock.knows(model):
+            self._send_json({'error': f'model "{model}" not found, try pulling it first'}, 404)
+            return
+
+        if is_chat:
+            messages = body.get('messages') or []
+            prompt_text = '\n'.join(message.get('content', '') for message in messages)
+            evaluated_text = prompt_text
+            if not messages:
+                # An empty chat only loads (or with keep_alive 0, unloads) the model
+                self.mock.ensure_loaded(model, body.get('keep_alive'))
+                self._send_json({'model': model, 'created_at': now_iso(), 'done': True, 'done_reason': 'load',
+                                 'message': {'role': 'assistant', 'content': ''}})
+                return
+        else:
+            prompt = body.get('prompt') or ''
+            system = body.get('system') or ''
+            if not prompt:
+                load_duration = self.mock.ensure_loaded(model, body.get('keep_alive'))
+                keep_alive = parse_keep_alive(body.get('keep_alive'), self.mock.keep_alive)
+                self._send_json({'model': model, 'created_at': now_iso(), 'response': '', 'done': True,
+                                 'done_reason': 'load' if keep_alive > 0 else 'unload',
+                                 'load_duration': int(load_duration * 1e9)})
+                return
+            prompt_text = f"{system}\n{prompt}"
+            # Tokens already in the passed context are not evaluated again
+            evaluated_text = prompt if body.get('context') else prompt_text
+
+        def message(piece: str) -> dict:
+            if is_chat:
+                return {'message': {'role': 'assistant', 'content': piece}}
+            return {'response': piece}
+
+        reply = self.mock.reply(model, prompt_text, evaluated_text, body.get('options'), body.get('keep_alive'))
+        stream = body.get('stream', True)
+        if stream:
+            self._start_stream()
+
+        pieces = []
+        for piece, final in reply:
+            if final is None:
+                pieces.append(piece)
+                if stream:
+                    self._write_chunk({'model': model, 'created_at': now_iso(), **message(piece), 'done': False})
+                continue
+
+            text = final.pop('text')
+            payload = {'model': model, 'created_at': now_iso(), **message('' if stream else text), **final}
+            if not is_chat:
+                payload['context'] = list(body.get('context') or []) + token_ids(evaluated_text) + token_ids(text)
+            if stream:
+                self._write_chunk(payload)
+                self._write_chunk(None)
+            else:
+                self._send_json(payload)
+
+def serve(host: str = '127.0.0.1', port: int = 11435, **settings) -> ThreadingHTTPServer:
+    """Start the mock server on a background thread and return it (port 0 picks a free port)."""
+    handler = type('Handler', (MockOllamaHandler,), {'mock': MockOllama(**settings)})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description="Deterministic stand-in for the Ollama API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--latency", type=float, default=0.2, help="Seconds before prompt evaluation starts")
+    parser.add_argument("--tokens_per_second", type=float, default=50.0, help="Generation speed")
+    parser.add_argument("--prompt_tokens_per_second", type=float, default=1000.0, help="Prompt evaluation speed")
+    parser.add_argument("--load_delay", type=float, default=2.0, help="Seconds to load a cold model")
+    parser.add_argument("--keep_alive", type=float, default=300.0, help="Default seconds a model stays loaded")
+    parser.add_argument("--rules", help="JSON file of [{match, response | response_file}] rules")
+    parser.add_argument("--models", help="Comma-separated models to serve (default: any name)")
+    args = parser.parse_args()
+
+    rules = None
+    if args.rules:
+        with open(args.rules, 'r', encoding='utf-8') as f:
+            rules = json.load(f)
+
+    server = serve(
+        args.host, args.port,
+        latency=args.latency,
+        tokens_per_second=args.tokens_per_second,
+        prompt_tokens_per_second=args.prompt_tokens_per_second,
+        load_delay=args.load_delay,
+        keep_alive=args.keep_alive,
+        rules=rules,
+        models=args.models.split(',') if args.models else None
+    )
+    print(f"Mock Ollama listening on http://{args.host}:{server.server_port}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+"""Compare transcription backends and precisions on a reference clip: real-time factor and word error rate.
+
+Each backend/precision pair is loaded through TranscriptionService (so int8
+gets the same quantization the app uses), warmed up, then timed over several
+runs. WER is measured against --reference, or against the first pair's
+transcript when no reference text is given. With --max_wer / --max_rtf the
+script exits non-zero when any pair misses the threshold, so every backend is
+validated by the same check before it is deployed.
+
+    python benchmarks/transcription_benchmark.py --audio clip.wav --reference clip.txt
+    python benchmarks/transcription_benchmark.py --audio clip.wav --precisions fp32,int8 --intra_op_threads 4
+    python benchmarks/transcription_benchmark.py --audio clip.wav --reference clip.txt \
+        --backends whisper,faster-whisper --precisions int8 --max_wer 0.15 --max_rtf 0.5
+    python benchmarks/transcription_benchmark.py --audio debrief.flac --precisions int8 --parallel_workers 2,4,8
+
+--parallel_workers also times the long-audio mode (LongAudioService) at each
+worker count against the serial transcript of the first pair.
+"""
+import argparse
+import itertools
+import json
+import os
+import re
+import statistics
+import sys
+import time
+from typing import List
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "../medical_scribe"))
+from config import Config
+from app.services.transcription_service import TranscriptionService
+from app.services.long_audio_service import LongAudioService
+
+SAMPLE_RATE = 16000
+
+def normalize_words(text: str) -> List[str]:
+    return re.sub(r"[^\w\s']", ' ', text.lower()).split()
+
+def word_error_rate(reference: str, hypothesis: str) -> float:
+    """Word-level edit distance divided by the reference length."""
+    ref, hyp = normalize_words(reference), normalize_words(hypothesis)
+    if not ref:
+        return 0.0 if not hyp else 1.0
+    previous = list(range(len(hyp) + 1))
+    for i, ref_word in enumerate(ref, start=1):
+        current = [i] + [0] * len(hyp)
+        for j, hyp_word in enumerate(hyp, start=1):
+            current[j] = min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (ref_word != hyp_word)
+            )
+        previous = current
+    return previous[-1] / len(ref)
+
+def benchmark_precision(audio, model_size: str, precision: str, runs: int, backend: str = None) -> dict:
+    key = TranscriptionService.resolve_model_key(model_size, precision=precision, backend=backend)
+    registry = TranscriptionService.get_registry()
+
+    started = time.perf_counter()
+    TranscriptionService.get_model(*key)
+    load_s = time.perf_counter() - started
+    model_bytes = next(
+        (entry['bytes'] for entry in registry.stats()['warm'] if tuple(entry['key']) == key), None
+    )
+
+    # Warm-up on a short slice so allocator and thread pool start-up are not timed
+    TranscriptionService.transcribe_buffer(audio[:SAMPLE_RATE * 5], model_size, precision, key[3])
+
+    audio_s = len(audio) / SAMPLE_RATE
+    timings = []
+    transcript = ''
+    for _ in range(runs):
+        started = time.perf_counter()
+        transcript = TranscriptionService.transcribe_buffer(audio, model_size, precision, key[3])['text']
+        timings.append(time.perf_counter() - started)
+
+    registry.evict(key)
+    inference_s = statistics.median(timings)
+    return {
+        'model': model_size,
+        'backend': key[3],
+        'device': key[1],
+        'precision': key[2],
+        'load_s': round(load_s, 3),
+        'model_mb': round(model_bytes / 1e6, 1) if model_bytes else None,
+        'inference_s': round(inference_s, 3),
+        'real_time_factor': round(inference_s / audio_s, 4) if audio_s else None,
+        'transcript': transcript.strip()
+    }
+
+def benchmark_parallel(audio, model_size: str, precision: str, backend: str, workers: int) -> dict:
+    """Time one long-audio run with the worker pool already started and its models loaded."""
+    key = TranscriptionService.resolve_model_key(model_size, precision=precision, backend=backend)
+    LongAudioService.warm_up(key, workers)
+    started = time.perf_counter()
+    result = LongAudioService.transcribe(audio, model_size, precision, backend, workers=workers)
+    inference_s = time.perf_counter() - started
+    return {
+        'workers': workers,
+        'chunks': result['parallel']['chunks'],
+        'inference_s': round(inference_s, 3),
+        'real_time_factor': round(inference_s / (len(audio) / SAMPLE_RATE), 4),
+        'transcript': result['text'].strip()
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Transcription backend and precision benchmark (RTF and WER)")
+    parser.add_argument("--audio", required=True, help="Reference clip")
+    parser.add_argument("--reference", help="Text file with the reference transcript")
+    parser.add_argument("--model", default=Config.WHISPER_MODEL, help="Whisper model size")
+    parser.add_argument("--backends", default=Config.TRANSCRIPTION_BACKEND, help="Comma-separated backends (whisper, faster-whisper)")
+    parser.add_argument("--precisions", default="fp32,int8", help="Comma-separated precisions; the first backend/precision pair is the baseline")
+    parser.add_argument("--device", default="cpu", help="Device to run on")
+    parser.add_argument("--runs", type=int, default=3, help="Timed runs per precision (the median is reported)")
+    parser.add_argument("--intra_op_threads", type=int, default=0, help="torch intra-op threads (0 = Config/default)")
+    parser.add_argument("--inter_op_threads", type=int, default=0, help="torch inter-op threads (0 = Config/default)")
+    parser.add_argument("--vad", action="store_true", help="Trim silences before inference, as the app does with VAD_ENABLED")
+    parser.add_argument("--max_wer", type=float, help="Fail if any pair's WER is above this")
+    parser.add_argument("--max_rtf", type=float, help="Fail if any pair's real-time factor is above this")
+    parser.add_argument("--parallel_workers", help="Comma-separated worker counts for the long-audio mode")
+    parser.add_argument("--output", help="Write the results as JSON")
+    args = parser.parse_args()
+
+    Config.WHISPER_DEVICE = args.device
+    Config.VAD_ENABLED = args.vad
+    TranscriptionService.configure_threads(args.intra_op_threads or None, args.inter_op_threads or None)
+
+    audio = TranscriptionService.load_audio_buffer(args.audio)
+    reference = None
+    if args.reference:
+        with open(args.reference, 'r', encoding='utf-8') as f:
+            reference = f.read()
+
+    results = []
+    for backend, precision in itertools.product(args.backends.split(','), args.precisions.split(',')):
+        print(f"Benchmarking {backend} {args.model} {precision} on {args.device}...")
+        result = benchmark_precision(audio, args.model, precision, args.runs, backend)
+        if reference is None:
+            reference = result['transcript']
+        result['wer'] = round(word_error_rate(reference, result['transcript']), 4)
+        results.append(result)
+
+    baseline = results[0]
+    reference_name = 'file' if args.reference else f"{baseline['backend']} {baseline['precision']}"
+    print(f"\nClip: {len(audio) / SAMPLE_RATE:.1f}s, reference: {reference_name}")
+    print(f"{'backend':<16}{'precision':<10}{'load s':>8}{'model MB':>10}{'RTF':>8}{'speed-up':>10}{'WER':>8}")
+    failures = []
+    for result in results:
+        speed_up = baseline['inference_s'] / result['inference_s'] if result['inference_s'] else 0
+        print(f"{result['backend']:<16}{result['precision']:<10}{result['load_s']:>8.2f}{result['model_mb'] or 0:>10.1f}"
+              f"{result['real_time_factor']:>8.3f}{speed_up:>9.2f}x{result['wer']:>8.3f}")
+        name = f"{result['backend']} {result['precision']}"
+        if args.max_wer is not None and result['wer'] > args.max_wer:
+            failures.append(f"{name}: WER {result['wer']:.3f} > {args.max_wer}")
+        if args.max_rtf is not None and result['real_time_factor'] > args.max_rtf:
+            failures.append(f"{name}: RTF {result['real_time_factor']:.3f} > {args.max_rtf}")
+
+    parallel = []
+    if args.parallel_workers:
+        for workers in [int(count) for count in args.parallel_workers.split(',')]:
+            print(f"\nBenchmarking long-audio mode with {workers} workers...")
+            result = benchmark_parallel(audio, args.model, baseline['precision'], baseline['backend'], workers)
+            result['wer_vs_serial'] = round(word_error_rate(baseline['transcript'], result['transcript']), 4)
+            parallel.append(result)
+        LongAudioService.shutdown()
+
+        print(f"\n{'workers':<10}{'chunks':>8}{'seconds':>10}{'RTF':>8}{'speed-up':>10}{'WER vs serial':>15}")
+        for result in parallel:
+            speed_up = baseline['inference_s'] / result['inference_s'] if result['inference_s'] else 0
+            print(f"{result['workers']:<10}{result['chunks']:>8}{result['inference_s']:>10.2f}"
+                  f"{result['real_time_factor']:>8.3f}{speed_up:>9.2f}x{result['wer_vs_serial']:>15.3f}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({
+                'audio': args.audio, 'audio_s': len(audio) / SAMPLE_RATE, 'results': results, 'parallel': parallel
+            }, f, indent=2)
+        print(f"Results written to {args.output}")
+
+    if failures:
+        print("\nFAILED:\n  " + "\n  ".join(failures))
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
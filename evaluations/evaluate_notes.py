@@ -4,7 +4,9 @@ import pandas as pd
 from pathlib import Path
 import json
 from typing import Dict, List, Tuple
-from ollama import Client
+import sys
+sys.path.append(os.path.join(os.path.dirname(__file__), "../medical_scribe"))
+from app.services.ollama_client import OllamaClient
 
 SYSTEM_PROMPT = """Please act as an impartial judge and evaluate the quality of a clinical Subjective, Objective, Assessment, Plan (SOAP) note provided by an AI assistant. Your evaluation must objectively assess the note using these four metrics: **clinical accuracy**, **completeness**, **conciseness**, and **clarity**.
 
@@ -88,8 +90,7 @@ def evaluate_note(note: str) -> Tuple[Dict[str, float], str]:
 Please evaluate the SOAP note according to the criteria above."""
 
     try:
-        client = Client()
-        response = client.generate(
+        response = OllamaClient.generate(
             model='mistral',
             prompt=prompt,
             system=SYSTEM_PROMPT
@@ -1,8 +1,10 @@
 import os
 import random
 from typing import List, Dict
-import ollama
 import time
+import sys
+sys.path.append(os.path.join(os.path.dirname(__file__), "../medical_scribe"))
+from app.services.ollama_client import OllamaClient
 
 # Constants
 PATHOLOGIES = [
@@ -98,7 +100,7 @@ def get_followup_period() -> str:
 def generate_interview(prompt: str) -> str:
     """Generate an interview using Ollama."""
     try:
-        response = ollama.generate(
+        response = OllamaClient.generate(
             model='phi3:14b',
             prompt=prompt,
             options={
@@ -1,54 +1,121 @@
 import os
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
 import sys
 sys.path.append(os.path.join(os.path.dirname(__file__), "../medical_scribe"))
 from app.services.transcription_service import TranscriptionService
 
-def transcribe_mock_interviews():
+def init_worker(threads: int, whisper_model: str = None):
+    """Pin torch thread counts and load the model once per worker process."""
+    TranscriptionService.configure_threads(intra_op=threads, inter_op=1)
+    TranscriptionService.get_model(whisper_model)
+
+def transcribe_file(audio_file: Path, output_file: Path, whisper_model: str = None):
+    """Transcribe one file and save the transcript. Returns (audio seconds, cache hit, error message)."""
+    try:
+        transcript, timings = TranscriptionService.transcribe_audio(
+            str(audio_file),
+            return_timings=True,
+            model_size=whisper_model
+        )
+
+        # Save the transcript
+        with open(output_file, 'w', encoding='utf-8') as f:
+            f.write(transcript)
+
+        return timings['audio_s'], timings['cache_hit'], None
+    except Exception as e:
+        return 0.0, False, str(e)
+
+def transcribe_mock_interviews(workers: int = 1, threads_per_worker: int = None, whisper_model: str = None):
     # Define paths
     input_dir = Path("interviews/mock_interviews")
     output_dir = Path("interviews/data/mock_interviews")
-    
+
     # Create output directory if it doesn't exist
     output_dir.mkdir(parents=True, exist_ok=True)
-    
+
     # Get all audio files from input directory
     audio_files = []
     for root, _, files in os.walk(input_dir):
         for file in files:
             if file.lower().endswith(('.wav', '.mp3', '.m4a', '.flac', '.ogg', '.wma')):
                 audio_files.append(Path(root) / file)
-    
+
     if not audio_files:
         print(f"No audio files found in {input_dir}")
         return
-    
+
     print(f"Found {len(audio_files)} audio files to transcribe")
-    
-    # Process each audio file
+
+    # Skip files that already have a transcript so interrupted runs resume
+    pending = []
     for audio_file in audio_files:
-        try:
-            # Create output filename (same name as input but with .txt extension)
-            output_file = output_dir / f"{audio_file.stem}.txt"
-            
-            # Check if transcript already exists
-            if output_file.exists():
-                print(f"Skipping {audio_file.name}: transcript already exists")
-                continue
-                
+        # Create output filename (same name as input but with .txt extension)
+        output_file = output_dir / f"{audio_file.stem}.txt"
+        if output_file.exists():
+            print(f"Skipping {audio_file.name}: transcript already exists")
+            continue
+        pending.append((audio_file, output_file))
+
+    if not pending:
+        return
+
+    started = time.perf_counter()
+    total_audio_s = 0.0
+    succeeded = 0
+    cache_hits = 0
+
+    def report(audio_file, output_file, audio_s, cache_hit, error):
+        nonlocal total_audio_s, succeeded, cache_hits
+        if error:
+            print(f"Error processing {audio_file.name}: {error}")
+            return
+        total_audio_s += audio_s
+        succeeded += 1
+        cache_hits += int(cache_hit)
+        source = " (from transcript cache)" if cache_hit else ""
+        print(f"Successfully transcribed {audio_file.name} to {output_file}{source}")
+
+    if workers <= 1:
+        for audio_file, output_file in pending:
             print(f"Processing {audio_file.name}...")
-            
-            # Transcribe the audio
-            transcript = TranscriptionService.transcribe_audio(str(audio_file))
-            
-            # Save the transcript
-            with open(output_file, 'w', encoding='utf-8') as f:
-                f.write(transcript)
-            
-            print(f"Successfully transcribed {audio_file.name} to {output_file}")
-            
-        except Exception as e:
-            print(f"Error processing {audio_file.name}: {str(e)}")
+            report(audio_file, output_file, *transcribe_file(audio_file, output_file, whisper_model))
+    else:
+        threads = threads_per_worker or max(1, (os.cpu_count() or 1) // workers)
+        print(f"Transcribing with {workers} worker processes x {threads} torch threads")
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=init_worker,
+            initargs=(threads, whisper_model)
+        ) as executor:
+            futures = {
+                executor.submit(transcribe_file, audio_file, output_file, whisper_model): (audio_file, output_file)
+                for audio_file, output_file in pending
+            }
+            for future in as_completed(futures):
+                audio_file, output_file = futures[future]
+                report(audio_file, output_file, *future.result())
+
+    wall_s = time.perf_counter() - started
+    print(f"\nTranscribed {succeeded}/{len(pending)} files: "
+          f"{total_audio_s:.1f} audio-seconds in {wall_s:.1f} wall-seconds "
+          f"({total_audio_s / wall_s if wall_s else 0:.2f} audio-s/wall-s, {cache_hits} cache hits)")
 
 if __name__ == "__main__":
-    transcribe_mock_interviews()
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Transcribe mock interview recordings')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Number of worker processes (1 transcribes serially)')
+    parser.add_argument('--threads_per_worker', type=int, default=None,
+                        help='Torch threads per worker (default: CPU cores / workers)')
+    parser.add_argument('--whisper_model', type=str, default=None,
+                        help='Whisper model size (default: WHISPER_MODEL from config)')
+
+    args = parser.parse_args()
+
+    transcribe_mock_interviews(args.workers, args.threads_per_worker, args.whisper_model)
@@ -1,7 +1,10 @@
 from flask import Flask
+from flask_sock import Sock
 from config import Config
 import os
 
+sock = Sock()
+
 def create_app(config_class=Config):
     app = Flask(__name__)
     app.config.from_object(config_class)
@@ -11,5 +14,10 @@ def create_app(config_class=Config):
     
     from app.routes import main
     app.register_blueprint(main)
+    sock.init_app(app)
+
+    if app.config['RETENTION_ENABLED']:
+        from app.services.retention_service import RetentionService
+        RetentionService.start(app.config)
     
-    return app 
\ No newline at end of file
+    return app
@@ -1,8 +1,17 @@
-from flask import Blueprint, render_template, request, jsonify, send_file, current_app
-from app.services.audio_service import AudioService
+from flask import Blueprint, Response, render_template, request, jsonify, send_from_directory, current_app, url_for, stream_with_context
+from app.services.audio_service import AudioService, UploadError
+from app.services.job_service import JobService
 from app.services.transcription_service import TranscriptionService
 from app.services.note_generation_service import NoteGenerationService
+from app.services.note_repair_service import NoteRepairService
+from app.services.streaming_service import StreamingSession
+from app.services.retention_service import RetentionService
+from app.services.metrics_service import MetricsService
+from app import sock
+import json
 import os
+import time
+import uuid
 
 main = Blueprint('main', __name__)
 
@@ -10,48 +19,294 @@ main = Blueprint('main', __name__)
 def index():
     return render_template('index.html')
 
+def processing_options(values):
+    """Read and validate the model, whisper_model and strategy fields of a request."""
+    whisper_model = values.get('whisper_model') or None
+    TranscriptionService.resolve_model_key(whisper_model)
+
+    strategy = values.get('strategy') or current_app.config['NOTE_STRATEGY']
+    if strategy not in NoteGenerationService.STRATEGIES:
+        raise ValueError(f"Unknown strategy '{strategy}'")
+
+    return {
+        'model': values.get('model'),
+        'whisper_model': whisper_model,
+        'strategy': strategy
+    }
+
+def submit_job(audio_path, options):
+    """Queue transcription and note generation on the background worker pool."""
+    job_id = JobService.submit(
+        audio_path,
+        options['model'],
+        whisper_model=options['whisper_model'],
+        strategy=options['strategy'],
+        max_workers=current_app.config['JOB_WORKERS'],
+        result_ttl=current_app.config['JOB_RESULT_TTL']
+    )
+    return {
+        'jobId': job_id,
+        'statusUrl': url_for('main.get_job', job_id=job_id),
+        'eventsUrl': url_for('main.get_job_events', job_id=job_id),
+        'resultUrl': url_for('main.get_job_result', job_id=job_id)
+    }
+
 @main.route('/process-audio', methods=['POST'])
 def process_audio():
+    # The multipart body is read on first access to request.files
+    started = time.perf_counter()
     if 'audio' not in request.files:
         return jsonify({'error': 'No audio file provided'}), 400
-    
+
     audio_file = request.files['audio']
     if audio_file.filename == '':
         return jsonify({'error': 'No selected file'}), 400
-    
+
+    try:
+        options = processing_options(request.form)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
     try:
-        model = request.form.get('model')
-        
         # Save audio file
         audio_path = AudioService.save_audio(audio_file)
-        
-        # Transcribe audio
-        transcript = TranscriptionService.transcribe_audio(audio_path, save_to_file=True)
-        
-        # Generate note using the specified model
-        note = NoteGenerationService.generate_note_from_transcript(
-            transcript=transcript,
-            model=model
-        )
-        
-        # Get the filename for download
-        filename = os.path.basename(audio_path)
-        
-        return jsonify({
-            'transcript': transcript,
-            'note': note,
-            'audioPath': filename
-        })
+        MetricsService.UPLOAD_SECONDS.labels('multipart').observe(time.perf_counter() - started)
+        MetricsService.UPLOAD_BYTES.labels('multipart').observe(os.path.getsize(audio_path))
+
+        return jsonify(submit_job(audio_path, options)), 202
     except Exception as e:
         # Ensure cleanup even if processing fails
         if 'audio_path' in locals():
             AudioService.cleanup_audio(audio_path)
         return jsonify({'error': str(e)}), 500
 
+@main.route('/uploads', methods=['POST'])
+def create_upload():
+    """Start a resumable upload. JSON body: filename, size, and the processing fields."""
+    data = request.get_json(silent=True) or {}
+    try:
+        options = processing_options(data)
+        upload_id = AudioService.create_upload(data.get('filename'), data.get('size'), options)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except UploadError as e:
+        return jsonify({'error': str(e)}), e.status_code
+
+    return jsonify({
+        'uploadId': upload_id,
+        'offset': 0,
+        'uploadUrl': url_for('main.upload_chunk', upload_id=upload_id)
+    }), 201
+
+def completed_upload_response(completed, status=200):
+    """The job of a finished upload, in the shape of the final PATCH response."""
+    response = jsonify({'offset': completed['size'], 'size': completed['size'], **completed['job']})
+    response.headers['Upload-Offset'] = str(completed['size'])
+    return response, status
+
+@main.route('/uploads/<upload_id>', methods=['GET', 'HEAD'])
+def get_upload(upload_id):
+    completed = AudioService.get_completed_upload(upload_id)
+    if completed is not None:
+        return completed_upload_response(completed)
+
+    try:
+        upload = AudioService.get_upload(upload_id)
+    except UploadError as e:
+        return jsonify({'error': str(e)}), e.status_code
+
+    response = jsonify({'offset': upload['offset'], 'size': upload['size']})
+    response.headers['Upload-Offset'] = str(upload['offset'])
+    return response
+
+@main.route('/uploads/<upload_id>', methods=['PATCH'])
+def upload_chunk(upload_id):
+    """Append the raw request body at the Upload-Offset header. The job starts
+    as soon as the final byte lands; repeating a request after that returns the
+    same job."""
+    completed = AudioService.get_completed_upload(upload_id)
+    if completed is not None:
+        return completed_upload_response(completed, 202)
+
+    offset = request.headers.get('Upload-Offset', '')
+    if not offset.isdigit():
+        return jsonify({'error': 'Upload-Offset header is required'}), 400
+
+    try:
+        started = time.perf_counter()
+        new_offset = AudioService.append_upload_chunk(upload_id, int(offset), request.stream)
+        MetricsService.UPLOAD_SECONDS.labels('resumable_chunk').observe(time.perf_counter() - started)
+        upload = AudioService.get_upload(upload_id)
+        if new_offset < upload['size']:
+            response = jsonify({'offset': new_offset, 'size': upload['size']})
+            response.headers['Upload-Offset'] = str(new_offset)
+            return response
+
+        completed = AudioService.finalize_upload(upload_id, submit_job)
+        MetricsService.UPLOAD_BYTES.labels('resumable').observe(new_offset)
+    except UploadError as e:
+        # Another request may have finished the upload in the meantime
+        completed = AudioService.get_completed_upload(upload_id)
+        if completed is not None:
+            return completed_upload_response(completed, 202)
+        return jsonify({'error': str(e), 'offset': e.offset}), e.status_code
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+    return completed_upload_response(completed, 202)
+
+@main.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    job = JobService.get_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(JobService.public_status(job))
+
+@main.route('/jobs/<job_id>/events', methods=['GET'])
+def get_job_events(job_id):
+    """Server-Sent Events stream of a job's stage changes, note tokens and final result."""
+    if JobService.get_job(job_id) is None:
+        return jsonify({'error': 'Job not found'}), 404
+
+    # Resume after the last event the browser saw when EventSource reconnects
+    last_event_id = request.headers.get('Last-Event-ID', '')
+    start = int(last_event_id) + 1 if last_event_id.isdigit() else 0
+
+    def stream():
+        for index, event in JobService.iter_events(job_id, start=start):
+            if event is None:
+                yield ': keep-alive\n\n'
+                continue
+            yield f"id: {index}\nevent: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+    return Response(
+        stream_with_context(stream()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@main.route('/jobs/<job_id>/result', methods=['GET'])
+def get_job_result(job_id):
+    job = JobService.get_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    if job['stage'] == 'failed':
+        return jsonify({'error': job['error']}), 500
+    if job['stage'] != 'done':
+        return jsonify(JobService.public_status(job)), 202
+
+    return jsonify({
+        'transcript': job['transcript'],
+        'note': job['note'],
+        'timings': job['timings'],
+        'audioPath': os.path.basename(job['audioPath'])
+    })
+
+def save_interrupted_session(session):
+    """Queue the audio of a live session that ended without 'stop' as a regular job.
+
+    Returns the job links, or None when no audio was recorded.
+    """
+    if not session.recorded_samples:
+        AudioService.cleanup_audio(session.wav_path)
+        return None
+    job = submit_job(session.wav_path, {
+        'model': session.model,
+        'whisper_model': session.whisper_model,
+        'strategy': current_app.config['NOTE_STRATEGY']
+    })
+    print(f"Live session interrupted after {session.recorded_samples / StreamingSession.SAMPLE_RATE:.0f}s; "
+          f"queued {os.path.basename(session.wav_path)} as job {job['jobId']}")
+    return job
+
+@sock.route('/stream-audio', bp=main)
+def stream_audio(ws):
+    """Live transcription: a JSON 'start' message with the model, then binary
+    16 kHz float32 PCM frames, then a JSON 'stop' message ('cancel' discards
+    the recording). If the connection drops first, the audio received so far
+    is kept and processed as a regular job."""
+    session = None
+    saved = False
+    try:
+        start = json.loads(ws.receive())
+        if start.get('type') != 'start':
+            ws.send(json.dumps({'type': 'error', 'error': 'Expected a start message'}))
+            return
+
+        config = current_app.config
+        wav_path = os.path.join(config['UPLOAD_FOLDER'], f"{uuid.uuid4()}.wav")
+        session = StreamingSession(
+            model=start.get('model'),
+            whisper_model=start.get('whisperModel') or None,
+            send=lambda message: ws.send(json.dumps(message)),
+            wav_path=wav_path,
+            step_seconds=config['STREAM_STEP_SECONDS'],
+            window_seconds=config['STREAM_WINDOW_SECONDS'],
+            holdback_seconds=config['STREAM_HOLDBACK_SECONDS'],
+            note_update_words=config['STREAM_NOTE_UPDATE_WORDS']
+        )
+
+        while True:
+            message = ws.receive()
+            if isinstance(message, (bytes, bytearray)):
+                session.add_audio(message)
+            else:
+                control = json.loads(message).get('type')
+                if control == 'stop':
+                    break
+                if control == 'cancel':
+                    session.close()
+                    AudioService.cleanup_audio(session.wav_path)
+                    saved = True
+                    return
+
+        result = session.finish()
+        # The session's WAV is already 16 kHz mono; store it compactly like uploads
+        wav_path = AudioService.normalize_audio(wav_path)
+        with open(f"{os.path.splitext(wav_path)[0]}.txt", 'w', encoding='utf-8') as f:
+            f.write(result['transcript'])
+        saved = True
+
+        ws.send(json.dumps({
+            'type': 'done',
+            'transcript': result['transcript'],
+            'note': result['note'],
+            'audioPath': os.path.basename(wav_path)
+        }))
+    except Exception as e:
+        # A dropped connection (ConnectionClosed), a bad message or a server-side
+        # failure: keep whatever was recorded and finish it in the background
+        job = None
+        if session is not None and not saved:
+            session.close()
+            try:
+                job = save_interrupted_session(session)
+            except Exception as save_error:
+                print(f"Could not queue interrupted live session {session.wav_path}: {str(save_error)}")
+        try:
+            ws.send(json.dumps({'type': 'error', 'error': str(e), **(job or {})}))
+        except Exception:
+            pass
+
+@main.route('/metrics', methods=['GET'])
+def metrics():
+    body, content_type = MetricsService.render()
+    return Response(body, content_type=content_type)
+
+@main.route('/stats/note-repair', methods=['GET'])
+def note_repair_stats():
+    return jsonify(NoteRepairService.stats())
+
+@main.route('/stats/retention', methods=['GET'])
+def retention_stats():
+    return jsonify(RetentionService.stats(current_app.config['UPLOAD_FOLDER']))
+
 @main.route('/download-audio/<filename>')
 def download_audio(filename):
+    # Artifacts removed by the retention sweeper are simply gone: 404
+    if filename.endswith(RetentionService.PIN_SUFFIX):
+        return jsonify({'error': 'File not found'}), 404
     try:
-        file_path = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
-        return send_file(file_path, as_attachment=True)
+        return send_from_directory(current_app.config['UPLOAD_FOLDER'], filename, as_attachment=True)
     except Exception as e:
-        return jsonify({'error': str(e)}), 404 
\ No newline at end of file
+        return jsonify({'error': str(e)}), 404
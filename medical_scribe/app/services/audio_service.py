@@ -1,23 +1,276 @@
 import os
+import json
+import threading
+import time
 from werkzeug.utils import secure_filename
 from flask import current_app
+import ffmpeg
+import soundfile as sf
 import uuid
+from config import Config
+
+try:
+    import fcntl
+except ImportError:  # Windows: the per-process lock below still serializes threads
+    fcntl = None
+
+class UploadError(Exception):
+    """An upload request that cannot be applied; carries the HTTP status to return."""
+
+    def __init__(self, message, status_code=400, offset=None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.offset = offset
 
 class AudioService:
+    UPLOAD_BLOCK_SIZE = 64 * 1024
+    _upload_locks = {}
+    _upload_locks_lock = threading.Lock()
+    SAMPLE_RATE = 16000
+    # Canonical format -> (extension, ffmpeg output options)
+    CANONICAL_FORMATS = {
+        'flac': ('.flac', {'acodec': 'flac', 'sample_fmt': 's16'}),
+        'opus': ('.ogg', {'acodec': 'libopus', 'application': 'voip'})
+    }
+
     @staticmethod
     def save_audio(audio_file, is_blob=False):
         extension = '.wav' if is_blob else os.path.splitext(audio_file.filename)[1]
         filename = f"{uuid.uuid4()}{extension}"
         filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
         os.makedirs(os.path.dirname(filepath), exist_ok=True)
-        
+
         audio_file.save(filepath)
         return filepath
-    
+
     @staticmethod
     def cleanup_audio(filepath):
         try:
             if os.path.exists(filepath):
                 os.remove(filepath)
         except Exception as e:
-            print(f"Error cleaning up audio file: {str(e)}") 
\ No newline at end of file
+            print(f"Error cleaning up audio file: {str(e)}")
+
+    @staticmethod
+    def is_canonical(filepath, canonical_format):
+        """Whether the file is already 16 kHz mono in the canonical container."""
+        extension = AudioService.CANONICAL_FORMATS[canonical_format][0]
+        if not filepath.lower().endswith(extension):
+            return False
+        try:
+            info = sf.info(filepath)
+        except Exception:
+            return False
+        return info.samplerate == AudioService.SAMPLE_RATE and info.channels == 1
+
+    @staticmethod
+    def normalize_audio(filepath, canonical_format=None):
+        """Transcode a recording once to 16 kHz mono in the canonical format.
+        
+        The canonical file keeps the recording's name stem, so its transcript and
+        retention pin still match. The original is removed unless
+        Config.AUDIO_KEEP_ORIGINAL is set.
+        
+        Args:
+            filepath: Path of the saved recording
+            canonical_format: 'flac', 'opus' or 'none' (defaults to Config.AUDIO_CANONICAL_FORMAT)
+            
+        Returns:
+            str: Path of the canonical file (``filepath`` itself when nothing was done)
+        """
+        canonical_format = canonical_format or Config.AUDIO_CANONICAL_FORMAT
+        if canonical_format == 'none' or AudioService.is_canonical(filepath, canonical_format):
+            return filepath
+
+        extension, options = AudioService.CANONICAL_FORMATS[canonical_format]
+        stem = os.path.splitext(filepath)[0]
+        target = f"{stem}{extension}"
+        temporary = f"{stem}.normalizing{extension}"
+        if canonical_format == 'opus':
+            options = {**options, 'audio_bitrate': Config.AUDIO_OPUS_BITRATE}
+        original_bytes = os.path.getsize(filepath)
+
+        try:
+            (
+                ffmpeg
+                .input(filepath)
+                .output(temporary, ac=1, ar=AudioService.SAMPLE_RATE, vn=None, **options)
+                .overwrite_output()
+                .run(capture_stdout=True, capture_stderr=True)
+            )
+            os.replace(temporary, target)
+        except ffmpeg.Error as e:
+            AudioService.cleanup_audio(temporary)
+            raise Exception(f"Audio normalization failed: {e.stderr.decode(errors='replace')[-500:]}")
+
+        if target != filepath and not Config.AUDIO_KEEP_ORIGINAL:
+            AudioService.cleanup_audio(filepath)
+        print(f"Normalized {os.path.basename(filepath)} to {canonical_format}: "
+              f"{original_bytes / 1e6:.1f} MB -> {os.path.getsize(target) / 1e6:.1f} MB")
+        return target
+
+    # Resumable uploads: metadata and data for in-progress uploads live in
+    # UPLOAD_FOLDER/partial as <id>.json and <id>.part; a finished upload leaves
+    # <id>.done with its job, so a client that lost the last response can find it
+
+    @staticmethod
+    def _partial_paths(upload_id):
+        if not upload_id or not upload_id.isalnum():
+            raise UploadError('Invalid upload id', 404)
+        partial_folder = os.path.join(current_app.config['UPLOAD_FOLDER'], 'partial')
+        return (
+            os.path.join(partial_folder, f"{upload_id}.json"),
+            os.path.join(partial_folder, f"{upload_id}.part")
+        )
+
+    @staticmethod
+    def _completed_path(upload_id):
+        meta_path, _ = AudioService._partial_paths(upload_id)
+        return os.path.splitext(meta_path)[0] + '.done'
+
+    @staticmethod
+    def get_completed_upload(upload_id):
+        """Return ``{'size', 'job'}`` for a finished upload, or None."""
+        try:
+            with open(AudioService._completed_path(upload_id), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (UploadError, OSError, ValueError):
+            return None
+
+    @staticmethod
+    def create_upload(filename, size, metadata=None):
+        """Start a resumable upload of ``size`` bytes and return its id."""
+        max_size = current_app.config['MAX_UPLOAD_BYTES']
+        if not isinstance(size, int) or isinstance(size, bool) or size <= 0:
+            raise UploadError('Upload size must be a positive integer number of bytes')
+        if size > max_size:
+            raise UploadError(f"Upload of {size} bytes exceeds the {max_size} byte limit", 413)
+
+        upload_id = uuid.uuid4().hex
+        meta_path, data_path = AudioService._partial_paths(upload_id)
+        os.makedirs(os.path.dirname(meta_path), exist_ok=True)
+
+        extension = os.path.splitext(secure_filename(filename or ''))[1] or '.wav'
+        with open(meta_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'extension': extension,
+                'size': size,
+                'metadata': metadata or {},
+                'createdAt': time.time()
+            }, f)
+        open(data_path, 'wb').close()
+        return upload_id
+
+    @staticmethod
+    def get_upload(upload_id):
+        """Return the upload's metadata with its current ``offset`` (bytes received)."""
+        meta_path, data_path = AudioService._partial_paths(upload_id)
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                upload = json.load(f)
+            upload['offset'] = os.path.getsize(data_path)
+        except (OSError, ValueError):
+            raise UploadError('Upload not found', 404)
+        return upload
+
+    @staticmethod
+    def append_upload_chunk(upload_id, offset, stream):
+        """Stream a chunk straight to disk at ``offset`` and return the new offset.
+
+        The offset must equal the bytes already received, so a client resuming
+        after a dropped connection first asks for the current offset.
+        """
+        upload = AudioService.get_upload(upload_id)
+        _, data_path = AudioService._partial_paths(upload_id)
+
+        # One writer per upload: a retry overlapping a request that is still
+        # writing is rejected instead of appending the same bytes twice. The
+        # thread lock covers this process, flock the other server workers.
+        with AudioService._upload_locks_lock:
+            lock = AudioService._upload_locks.setdefault(upload_id, threading.Lock())
+        if not lock.acquire(blocking=False):
+            raise UploadError('Another chunk for this upload is still being written', 409, upload['offset'])
+        try:
+            try:
+                f = open(data_path, 'r+b')
+            except FileNotFoundError:
+                raise UploadError('Upload not found', 404)
+            with f:
+                if fcntl is not None:
+                    try:
+                        fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    except OSError:
+                        raise UploadError('Another chunk for this upload is still being written', 409, upload['offset'])
+
+                # Check the offset only once the lock is held
+                current = os.fstat(f.fileno()).st_size
+                if offset != current:
+                    raise UploadError('Offset does not match the bytes received', 409, current)
+
+                f.seek(offset)
+                received = offset
+                while True:
+                    block = stream.read(AudioService.UPLOAD_BLOCK_SIZE)
+                    if not block:
+                        break
+                    if received + len(block) > upload['size']:
+                        f.truncate(offset)
+                        raise UploadError('Chunk extends past the declared upload size', 413, offset)
+                    f.write(block)
+                    received += len(block)
+            return received
+        finally:
+            lock.release()
+
+    @staticmethod
+    def finalize_upload(upload_id, submit):
+        """Move a fully received upload into the upload folder and start its job.
+
+        ``submit(path, metadata)`` starts the job and returns its links. It runs
+        under the upload's locks, so concurrent final requests start one job and
+        the others return the same one.
+
+        Returns:
+            dict: ``{'size', 'job'}``, as later returned by get_completed_upload
+        """
+        meta_path, data_path = AudioService._partial_paths(upload_id)
+        with AudioService._upload_locks_lock:
+            lock = AudioService._upload_locks.setdefault(upload_id, threading.Lock())
+        with lock:
+            try:
+                f = open(data_path, 'rb')
+            except FileNotFoundError:
+                # Already moved by another request
+                completed = AudioService.get_completed_upload(upload_id)
+                if completed is None:
+                    raise UploadError('Upload not found', 404)
+                return completed
+
+            with f:
+                if fcntl is not None:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+                completed = AudioService.get_completed_upload(upload_id)
+                if completed is not None:
+                    return completed
+
+                upload = AudioService.get_upload(upload_id)
+                if upload['offset'] != upload['size']:
+                    raise UploadError('Upload is not complete', 409, upload['offset'])
+
+                filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], f"{uuid.uuid4()}{upload['extension']}")
+                os.replace(data_path, filepath)
+                try:
+                    job = submit(filepath, upload['metadata'])
+                except Exception:
+                    # Put the data back so the client can retry the final request
+                    os.replace(filepath, data_path)
+                    raise
+
+                completed = {'size': upload['size'], 'job': job, 'completedAt': time.time()}
+                with open(AudioService._completed_path(upload_id), 'w', encoding='utf-8') as done:
+                    json.dump(completed, done)
+                AudioService.cleanup_audio(meta_path)
+
+        with AudioService._upload_locks_lock:
+            AudioService._upload_locks.pop(upload_id, None)
+        return completed
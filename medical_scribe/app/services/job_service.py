@@ -0,0 +1,318 @@
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, Optional
+from app.services.audio_service import AudioService
+from app.services.cache_service import DiskCache
+from app.services.retention_service import RetentionService
+from app.services.metrics_service import MetricsService
+from app.services.transcription_service import TranscriptionService
+from app.services.note_generation_service import NoteGenerationService
+from config import Config
+
+class JobService:
+    """Runs /process-audio work (transcription, note generation, cleaning) on a
+    background worker pool so the request thread can return a job id right away.
+
+    Each job is also mirrored to a JSON snapshot in ``Config.JOB_STATE_DIR`` on
+    every stage change, so under a multi-process server the other workers can
+    answer status, result and event requests for it (without the token stream).
+    """
+
+    _executor = None
+    _jobs: Dict[str, dict] = {}
+    _events: Dict[str, list] = {}
+    _lock = threading.Lock()
+    _changed = threading.Condition(_lock)
+
+    @staticmethod
+    def public_status(job: dict) -> dict:
+        """Public view of a job: progress fields only, no filesystem paths."""
+        return {
+            'jobId': job['id'],
+            'stage': job['stage'],
+            'chunk': job['chunk'],
+            'totalChunks': job['totalChunks'],
+            'model': job['model'],
+            'whisperModel': job['whisperModel'],
+            'strategy': job['strategy'],
+            'error': job['error'],
+            'createdAt': job['createdAt'],
+            'updatedAt': job['updatedAt']
+        }
+
+    @classmethod
+    def get_executor(cls, max_workers: int) -> ThreadPoolExecutor:
+        with cls._lock:
+            if cls._executor is None:
+                cls._executor = ThreadPoolExecutor(
+                    max_workers=max_workers,
+                    thread_name_prefix='scribe-job'
+                )
+            return cls._executor
+
+    @classmethod
+    def submit(cls, audio_path: str, model: str, whisper_model: Optional[str] = None,
+               strategy: str = 'refine', max_workers: int = 2, result_ttl: int = 3600) -> str:
+        """Queue an uploaded recording for processing and return its job id.
+
+        Args:
+            audio_path: Path of the saved upload
+            model: The LLM model to use for note generation
+            whisper_model: Whisper model size for transcription (defaults to Config)
+            strategy: Note generation strategy ('refine' or 'map_reduce')
+            max_workers: Size of the worker pool (only used when the pool is first created)
+            result_ttl: Seconds to keep finished jobs before they are pruned
+        """
+        cls._prune(result_ttl)
+
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with cls._lock:
+            cls._jobs[job_id] = {
+                'id': job_id,
+                'stage': 'uploaded',
+                'chunk': None,
+                'totalChunks': None,
+                'model': model,
+                'whisperModel': whisper_model,
+                'strategy': strategy,
+                'audioPath': audio_path,
+                'transcript': None,
+                'note': None,
+                'timings': None,
+                'error': None,
+                'createdAt': now,
+                'updatedAt': now,
+                'finishedAt': None
+            }
+            cls._events[job_id] = [{'type': 'status', **cls.public_status(cls._jobs[job_id])}]
+            cls._save_snapshot(job_id)
+
+        RetentionService.pin(audio_path)
+        MetricsService.QUEUE_DEPTH.inc()
+        cls.get_executor(max_workers).submit(cls._run, job_id, audio_path, model, whisper_model, strategy)
+        return job_id
+
+    @classmethod
+    def get_job(cls, job_id: str) -> Optional[dict]:
+        with cls._lock:
+            job = cls._jobs.get(job_id)
+            if job:
+                return dict(job)
+        snapshot = cls._load_snapshot(job_id)
+        return snapshot['job'] if snapshot else None
+
+    @classmethod
+    def iter_events(cls, job_id: str, start: int = 0, heartbeat: float = 15.0) -> Iterator[tuple]:
+        """Yield (index, event) pairs for a job from ``start`` on, blocking for new ones.
+
+        Events are 'status' (stage changes), 'token' (streamed note text), and a
+        final 'done' or 'error'. ``(None, None)`` is yielded every ``heartbeat``
+        seconds without news so the caller can keep the connection alive.
+        """
+        with cls._lock:
+            local = job_id in cls._events
+        if not local:
+            yield from cls._iter_snapshot_events(job_id, start, heartbeat)
+            return
+
+        index = start
+        while True:
+            with cls._changed:
+                events = cls._events.get(job_id)
+                if events is None:
+                    return
+                if index >= len(events):
+                    cls._changed.wait(timeout=heartbeat)
+                    events = cls._events.get(job_id)
+                    if events is None:
+                        return
+                pending = events[index:]
+
+            if not pending:
+                yield None, None
+                continue
+
+            for event in pending:
+                yield index, event
+                index += 1
+                if event['type'] in ('done', 'error'):
+                    return
+
+    @classmethod
+    def _iter_snapshot_events(cls, job_id: str, start: int, heartbeat: float, poll: float = 1.0) -> Iterator[tuple]:
+        """iter_events for a job owned by another process, by polling its snapshot."""
+        index = start
+        idle = 0.0
+        while True:
+            snapshot = cls._load_snapshot(job_id)
+            if snapshot is None:
+                return
+            pending = [(i, event) for i, event in snapshot['events'] if i >= index]
+            for i, event in pending:
+                yield i, event
+                index = i + 1
+                if event['type'] in ('done', 'error'):
+                    return
+            if pending:
+                idle = 0.0
+            elif idle >= heartbeat:
+                yield None, None
+                idle = 0.0
+            time.sleep(poll)
+            idle += poll
+
+    @staticmethod
+    def _snapshot_path(job_id: str) -> str:
+        return os.path.join(Config.JOB_STATE_DIR, f"{job_id}.json")
+
+    @classmethod
+    def _save_snapshot(cls, job_id: str):
+        # Called with the lock held; token events are left out to keep writes small
+        events = [
+            [i, event] for i, event in enumerate(cls._events[job_id])
+            if event['type'] != 'token'
+        ]
+        try:
+            os.makedirs(Config.JOB_STATE_DIR, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=Config.JOB_STATE_DIR, suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump({'job': cls._jobs[job_id], 'events': events}, f)
+            os.replace(tmp_path, cls._snapshot_path(job_id))
+        except OSError as e:
+            print(f"Error saving job {job_id} snapshot: {str(e)}")
+
+    @classmethod
+    def _load_snapshot(cls, job_id: str) -> Optional[dict]:
+        if not job_id or not job_id.isalnum():
+            return None
+        try:
+            with open(cls._snapshot_path(job_id), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    @classmethod
+    def _publish(cls, job_id: str, event: dict):
+        with cls._changed:
+            events = cls._events.get(job_id)
+            if events is not None:
+                events.append(event)
+                cls._changed.notify_all()
+
+    @classmethod
+    def _update(cls, job_id: str, **fields):
+        with cls._changed:
+            job = cls._jobs.get(job_id)
+            if job is None:
+                return
+            stage_changed = any(
+                key in fields and fields[key] != job[key]
+                for key in ('stage', 'chunk', 'totalChunks')
+            )
+            job.update(fields)
+            job['updatedAt'] = time.time()
+            if job['stage'] in ('done', 'failed'):
+                job['finishedAt'] = job['updatedAt']
+
+            events = cls._events[job_id]
+            if stage_changed:
+                events.append({'type': 'status', **cls.public_status(job)})
+            if job['stage'] == 'done':
+                events.append({'type': 'done', 'note': job['note'], 'transcript': job['transcript']})
+            elif job['stage'] == 'failed':
+                events.append({'type': 'error', 'error': job['error']})
+            cls._save_snapshot(job_id)
+            cls._changed.notify_all()
+
+    @classmethod
+    def _prune(cls, result_ttl: int):
+        cutoff = time.time() - result_ttl
+        with cls._lock:
+            expired = [
+                job_id for job_id, job in cls._jobs.items()
+                if job['finishedAt'] is not None and job['finishedAt'] < cutoff
+            ]
+            for job_id in expired:
+                del cls._jobs[job_id]
+                cls._events.pop(job_id, None)
+
+        # Snapshots are shared between processes; only finished jobs expire, since
+        # a long-running stage leaves its snapshot untouched for a while
+        if os.path.isdir(Config.JOB_STATE_DIR):
+            for entry in os.scandir(Config.JOB_STATE_DIR):
+                try:
+                    if entry.name.endswith('.tmp'):
+                        # Left behind by a write that was interrupted
+                        if entry.stat().st_mtime < cutoff:
+                            os.remove(entry.path)
+                        continue
+                    snapshot = cls._load_snapshot(entry.name[:-len('.json')])
+                    finished_at = snapshot['job']['finishedAt'] if snapshot else None
+                    if finished_at is not None and finished_at < cutoff:
+                        os.remove(entry.path)
+                except OSError:
+                    pass
+
+    @classmethod
+    def _run(cls, job_id: str, audio_path: str, model: str, whisper_model: Optional[str], strategy: str):
+        def on_progress(stage, **details):
+            if stage == 'chunk':
+                cls._update(
+                    job_id,
+                    stage='generating',
+                    chunk=details.get('current'),
+                    totalChunks=details.get('total')
+                )
+            else:
+                cls._update(job_id, stage=stage)
+
+        def on_token(text):
+            cls._publish(job_id, {'type': 'token', 'text': text})
+
+        try:
+            # Key the transcript cache on the upload as received, as the batch
+            # scripts do, rather than on the transcoded copy
+            audio_hash = DiskCache.hash_file(audio_path) if Config.TRANSCRIPT_CACHE_ENABLED else None
+
+            cls._update(job_id, stage='normalizing')
+            started = time.perf_counter()
+            audio_path = AudioService.normalize_audio(audio_path)
+            normalize_s = time.perf_counter() - started
+            MetricsService.NORMALIZE_SECONDS.observe(normalize_s)
+            MetricsService.STORED_AUDIO_BYTES.observe(os.path.getsize(audio_path))
+
+            cls._update(job_id, stage='transcribing', audioPath=audio_path)
+            transcript, timings = TranscriptionService.transcribe_audio(
+                audio_path,
+                save_to_file=True,
+                return_timings=True,
+                model_size=whisper_model,
+                audio_hash=audio_hash
+            )
+            cls._update(job_id, transcript=transcript, timings={**timings, 'normalize_s': normalize_s})
+
+            note = NoteGenerationService.generate_note_from_transcript(
+                transcript=transcript,
+                model=model,
+                progress_callback=on_progress,
+                strategy=strategy,
+                token_callback=on_token
+            )
+
+            cls._update(job_id, stage='done', note=note)
+        except Exception as e:
+            print(f"Job {job_id} failed: {str(e)}")
+            AudioService.cleanup_audio(audio_path)
+            cls._update(job_id, stage='failed', error=str(e))
+        finally:
+            RetentionService.unpin(audio_path)
+            MetricsService.QUEUE_DEPTH.dec()
+            job = cls.get_job(job_id)
+            if job:
+                MetricsService.JOB_SECONDS.labels(job['stage']).observe(time.time() - job['createdAt'])
@@ -0,0 +1,260 @@
+import multiprocessing
+import os
+import re
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional
+import numpy as np
+from whisper.audio import SAMPLE_RATE
+from config import Config
+from app.services.transcription_backends import get_backend
+from app.services.transcription_service import TranscriptionService
+from app.services.vad_service import VadService
+
+def _init_worker(key: tuple, threads: int):
+    """Pin torch threads and load the model once per worker process."""
+    # Set through Config so the registry's own configure_threads() applies the
+    # pool's share of the cores rather than WHISPER_INTRA_OP_THREADS
+    Config.WHISPER_INTRA_OP_THREADS = threads
+    Config.WHISPER_INTER_OP_THREADS = 1
+    TranscriptionService.get_model(*key)
+
+def _transcribe_chunk(audio: np.ndarray, key: tuple) -> dict:
+    model = TranscriptionService.get_model(*key)
+    return get_backend(key[3]).transcribe_buffer(model, audio, key[2])
+
+class LongAudioService:
+    """Parallel transcription of long recordings within one file.
+
+    The buffer is cut at silences near every ``PARALLEL_TRANSCRIBE_CHUNK_SECONDS``,
+    the chunks are transcribed in a pool of worker processes that each keep one
+    model loaded, and the results are stitched back in order. Where no silence
+    is found a hard cut is made with ``PARALLEL_TRANSCRIBE_OVERLAP_SECONDS`` of
+    overlap on each side, and words repeated across the cut are dropped.
+    """
+
+    # Fewer repeated words at a cut are more likely a real repetition ("the the")
+    MIN_OVERLAP_WORDS = 3
+
+    _pool = None
+    _pool_config = None
+    _pool_lock = threading.Lock()
+
+    @staticmethod
+    def core_share() -> int:
+        """This server process's share of the cores; every server worker has its own pool."""
+        return max(1, (os.cpu_count() or 1) // max(1, Config.SERVER_WORKERS))
+
+    @staticmethod
+    def worker_count() -> int:
+        return Config.PARALLEL_TRANSCRIBE_WORKERS or LongAudioService.core_share()
+
+    @staticmethod
+    def should_parallelize(audio: np.ndarray, key: tuple) -> bool:
+        """Parallel mode only pays off for long recordings on CPU with more than one worker.
+
+        Only the default model gets a pool, so requests for other models never
+        start a second set of worker processes.
+        """
+        return (
+            Config.PARALLEL_TRANSCRIBE_ENABLED
+            and key[1] == 'cpu'
+            and key == TranscriptionService.resolve_model_key()
+            and LongAudioService.worker_count() > 1
+            and len(audio) / SAMPLE_RATE >= Config.PARALLEL_TRANSCRIBE_MIN_SECONDS
+        )
+
+    @staticmethod
+    def plan_chunks(audio: np.ndarray, sample_rate: int, chunk_s: float, search_s: float,
+                    overlap_s: float, min_gap_s: float) -> List[dict]:
+        """Split a buffer into chunks of about ``chunk_s`` seconds, preferring silences as cut points.
+
+        Args:
+            audio: 16 kHz mono float32 buffer
+            sample_rate: Sample rate of the buffer
+            chunk_s: Target chunk length in seconds
+            search_s: How far either side of the target to look for a silence
+            overlap_s: Overlap added on both sides of a hard cut
+            min_gap_s: Shortest silence that can be cut at
+
+        Returns:
+            list of dicts with 'start'/'end' (the audio to transcribe) and
+            'core_start'/'core_end' (the part of it this chunk is responsible for), and
+            'hard_start' when the chunk starts at a cut with no silence
+        """
+        duration = len(audio) / sample_rate
+        spans = VadService.detect_speech(
+            audio, sample_rate,
+            frame_ms=Config.VAD_FRAME_MS,
+            threshold_db=Config.VAD_THRESHOLD_DB,
+            min_energy_db=Config.VAD_MIN_ENERGY_DB,
+            min_silence_s=min_gap_s,
+            pad_s=0.0
+        )
+        gaps = [(end, next_start) for (_, end), (next_start, _) in zip(spans, spans[1:])]
+
+        cuts = [(0.0, False)]
+        while duration - cuts[-1][0] > chunk_s + search_s:
+            previous = cuts[-1][0]
+            target = previous + chunk_s
+            candidates = [
+                (start + end) / 2 for start, end in gaps
+                if target - search_s <= (start + end) / 2 <= target + search_s
+            ]
+            if candidates:
+                cuts.append((min(candidates, key=lambda t: abs(t - target)), False))
+            else:
+                cuts.append((target, True))
+        cuts.append((duration, False))
+
+        chunks = []
+        for (start, hard_start), (end, hard_end) in zip(cuts, cuts[1:]):
+            chunks.append({
+                'start': max(0.0, start - overlap_s) if hard_start else start,
+                'end': min(duration, end + overlap_s) if hard_end else end,
+                'core_start': start,
+                'core_end': end,
+                'hard_start': hard_start
+            })
+        return chunks
+
+    @staticmethod
+    def _normalize(word: str) -> str:
+        return re.sub(r"[^\w']", '', word.lower())
+
+    @staticmethod
+    def dedupe_overlap(previous: str, text: str, max_words: int = 25, min_words: int = MIN_OVERLAP_WORDS) -> str:
+        """Drop the longest run of words (at least ``min_words``) at the start of ``text``
+        that repeats the end of ``previous``."""
+        previous_words = [LongAudioService._normalize(word) for word in previous.split()[-max_words:]]
+        words = text.split()
+        normalized = [LongAudioService._normalize(word) for word in words[:max_words]]
+        for size in range(min(len(previous_words), len(normalized)), min_words - 1, -1):
+            if previous_words[-size:] == normalized[:size]:
+                remaining = words[size:]
+                return ' ' + ' '.join(remaining) if remaining else ''
+        return text
+
+    @staticmethod
+    def stitch(chunks: List[dict], results: List[dict]) -> dict:
+        """Merge per-chunk results into one Whisper-style result with times in the full buffer."""
+        segments = []
+        language = None
+        for chunk, result in zip(chunks, results):
+            language = language or result.get('language')
+            kept = []
+            for segment in result.get('segments', []):
+                segment = dict(segment)
+                segment['start'] += chunk['start']
+                segment['end'] += chunk['start']
+                for word in segment.get('words', []) or []:
+                    word['start'] += chunk['start']
+                    word['end'] += chunk['start']
+                # Each segment belongs to the chunk whose core holds its midpoint
+                midpoint = (segment['start'] + segment['end']) / 2
+                if chunk['core_start'] <= midpoint < chunk['core_end'] or (
+                        midpoint >= chunk['core_end'] and chunk is chunks[-1]):
+                    kept.append(segment)
+
+            if chunk['hard_start'] and kept and segments:
+                previous_text = ''.join(segment['text'] for segment in segments[-3:])
+                kept[0]['text'] = LongAudioService.dedupe_overlap(previous_text, kept[0]['text'])
+            segments.extend(segment for segment in kept if segment['text'].strip())
+
+        for i, segment in enumerate(segments):
+            segment['id'] = i
+        return {
+            'text': ''.join(segment['text'] for segment in segments),
+            'segments': segments,
+            'language': language
+        }
+
+    @classmethod
+    def get_pool(cls, key: tuple, workers: int) -> ProcessPoolExecutor:
+        """The worker pool for a model key, started on first use.
+
+        There is one pool per process: a different key or worker count (only the
+        benchmark asks for one) first shuts the current pool down, so two sets of
+        workers are never alive at once.
+        """
+        with cls._pool_lock:
+            if cls._pool is not None and cls._pool_config != (key, workers):
+                cls._pool.shutdown(wait=True)
+                cls._pool = None
+            if cls._pool is None:
+                threads = max(1, cls.core_share() // workers)
+                # spawn: forking a process that already holds torch/CTranslate2 thread pools is unsafe
+                cls._pool = ProcessPoolExecutor(
+                    max_workers=workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_init_worker,
+                    initargs=(key, threads)
+                )
+                cls._pool_config = (key, workers)
+                print(f"Started {workers} transcription workers ({threads} threads each) for {key}")
+            return cls._pool
+
+    @classmethod
+    def warm_up(cls, key: tuple, workers: int):
+        """Start the pool and wait until every worker has loaded its model."""
+        pool = cls.get_pool(key, workers)
+        silence = np.zeros(SAMPLE_RATE, dtype=np.float32)
+        list(pool.map(_transcribe_chunk, [silence] * workers, [key] * workers))
+
+    @classmethod
+    def shutdown(cls):
+        with cls._pool_lock:
+            if cls._pool is not None:
+                cls._pool.shutdown()
+                cls._pool = None
+                cls._pool_config = None
+
+    @classmethod
+    def transcribe(cls, audio: np.ndarray, model_size: Optional[str] = None, precision: Optional[str] = None,
+                   backend: Optional[str] = None, workers: Optional[int] = None) -> dict:
+        """Transcribe a long buffer in parallel chunks.
+
+        Args:
+            audio: 16 kHz mono float32 buffer
+            model_size: Whisper model size (defaults to Config.WHISPER_MODEL)
+            precision: Model precision (defaults to Config.WHISPER_PRECISION)
+            backend: Transcription backend (defaults to Config.TRANSCRIPTION_BACKEND)
+            workers: Worker processes (defaults to PARALLEL_TRANSCRIBE_WORKERS or this server worker's share of the cores)
+
+        Returns:
+            Whisper-style result dict; with VAD enabled it also carries 'vad', and
+            'parallel' holds the chunk count and worker count
+        """
+        key = TranscriptionService.resolve_model_key(model_size, precision=precision, backend=backend)
+        workers = workers or cls.worker_count()
+        audio, timestamp_map, vad_stats = TranscriptionService._prepare_audio(audio)
+        if audio.size == 0:
+            return {
+                'text': '', 'segments': [], 'language': None, 'vad': vad_stats,
+                'parallel': {'chunks': 0, 'workers': workers}
+            }
+
+        started = time.perf_counter()
+        chunks = cls.plan_chunks(
+            audio, SAMPLE_RATE,
+            chunk_s=Config.PARALLEL_TRANSCRIBE_CHUNK_SECONDS,
+            search_s=Config.PARALLEL_TRANSCRIBE_CHUNK_SECONDS / 4,
+            overlap_s=Config.PARALLEL_TRANSCRIBE_OVERLAP_SECONDS,
+            min_gap_s=Config.PARALLEL_TRANSCRIBE_MIN_GAP_SECONDS
+        )
+        pool = cls.get_pool(key, workers)
+        futures = [
+            pool.submit(_transcribe_chunk, audio[int(chunk['start'] * SAMPLE_RATE):int(chunk['end'] * SAMPLE_RATE)], key)
+            for chunk in chunks
+        ]
+        result = cls.stitch(chunks, [future.result() for future in futures])
+        hard_cuts = sum(chunk['hard_start'] for chunk in chunks)
+        print(f"Transcribed {len(chunks)} chunks ({hard_cuts} hard cuts) on {workers} workers "
+              f"in {time.perf_counter() - started:.1f}s")
+
+        if timestamp_map is not None:
+            timestamp_map.remap_result(result)
+            result['vad'] = vad_stats
+        result['parallel'] = {'chunks': len(chunks), 'workers': workers}
+        return result
@@ -0,0 +1,120 @@
+import os
+from typing import Optional, Tuple
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+)
+
+# Seconds; wide enough for a short upload chunk up to a long note pass
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+BYTE_BUCKETS = tuple(2 ** power for power in range(16, 31, 2))  # 64 KiB .. 1 GiB
+RTF_BUCKETS = (0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1, 1.5, 2, 5)
+TOKEN_RATE_BUCKETS = (1, 2.5, 5, 10, 20, 40, 80, 160)
+
+class MetricsService:
+    """Prometheus metrics for the scribe pipeline, served at /metrics.
+
+    Under the production server each worker writes its samples to
+    ``PROMETHEUS_MULTIPROC_DIR`` and a scrape of any worker aggregates them all.
+    """
+
+    UPLOAD_BYTES = Histogram(
+        'scribe_upload_bytes', 'Size of completed uploads', ['kind'], buckets=BYTE_BUCKETS
+    )
+    UPLOAD_SECONDS = Histogram(
+        'scribe_upload_seconds', 'Time spent receiving an upload request body', ['kind'], buckets=LATENCY_BUCKETS
+    )
+    NORMALIZE_SECONDS = Histogram(
+        'scribe_audio_normalize_seconds', 'Time to transcode an upload to the canonical format',
+        buckets=LATENCY_BUCKETS
+    )
+    STORED_AUDIO_BYTES = Histogram(
+        'scribe_audio_stored_bytes', 'Size of recordings as kept on disk', buckets=BYTE_BUCKETS
+    )
+    DECODE_SECONDS = Histogram(
+        'scribe_audio_decode_seconds', 'Time to decode a recording to 16 kHz PCM', buckets=LATENCY_BUCKETS
+    )
+    AUDIO_SECONDS = Histogram(
+        'scribe_audio_duration_seconds', 'Duration of transcribed recordings',
+        buckets=(30, 60, 120, 300, 600, 900, 1200, 1800, 3600)
+    )
+    INFERENCE_SECONDS = Histogram(
+        'scribe_whisper_inference_seconds', 'Whisper inference time per recording', ['model'], buckets=LATENCY_BUCKETS
+    )
+    REAL_TIME_FACTOR = Histogram(
+        'scribe_whisper_real_time_factor', 'Whisper inference seconds per second of audio', ['model'],
+        buckets=RTF_BUCKETS
+    )
+    VAD_SKIPPED_SECONDS = Counter(
+        'scribe_vad_skipped_seconds_total', 'Audio seconds dropped as silence before Whisper'
+    )
+    TRANSCRIPT_CACHE = Counter(
+        'scribe_transcript_cache_total', 'Transcript cache lookups', ['result']
+    )
+    MODEL_LOADS = Counter(
+        'scribe_whisper_model_loads_total', 'Whisper models loaded into memory', ['model']
+    )
+    MODEL_LOAD_SECONDS = Histogram(
+        'scribe_whisper_model_load_seconds', 'Time to load a Whisper model', ['model'], buckets=LATENCY_BUCKETS
+    )
+    MODEL_EVICTIONS = Counter(
+        'scribe_whisper_model_evictions_total', 'Whisper models evicted from the warm pool', ['model']
+    )
+    LLM_REQUEST_SECONDS = Histogram(
+        'scribe_llm_request_seconds', 'Ollama request latency', ['model', 'method'], buckets=LATENCY_BUCKETS
+    )
+    LLM_TOKENS_PER_SECOND = Histogram(
+        'scribe_llm_tokens_per_second', 'Ollama generation speed (eval tokens per second)', ['model'],
+        buckets=TOKEN_RATE_BUCKETS
+    )
+    LLM_FAILURES = Counter(
+        'scribe_llm_failures_total', 'Ollama requests that failed after retries', ['model', 'method']
+    )
+    NOTE_CHUNK_SECONDS = Histogram(
+        'scribe_note_chunk_seconds', 'LLM time per transcript chunk', ['strategy'], buckets=LATENCY_BUCKETS
+    )
+    NOTE_CLEAN_RETRIES = Histogram(
+        'scribe_note_clean_retries', 'LLM cleaning attempts per note', buckets=(0, 1, 2, 3, 5)
+    )
+    JOB_SECONDS = Histogram(
+        'scribe_job_seconds', 'End-to-end /process-audio job time', ['outcome'], buckets=LATENCY_BUCKETS
+    )
+    QUEUE_DEPTH = Gauge(
+        'scribe_job_queue_depth', 'Jobs accepted but not finished', multiprocess_mode='livesum'
+    )
+
+    @staticmethod
+    def observe_transcription(model: str, timings: dict):
+        """Record the stage timings returned by TranscriptionService.transcribe_audio."""
+        MetricsService.TRANSCRIPT_CACHE.labels('hit' if timings.get('cache_hit') else 'miss').inc()
+        if timings.get('cache_hit'):
+            return
+        if timings.get('decode_s') is not None:
+            MetricsService.DECODE_SECONDS.observe(timings['decode_s'])
+        if timings.get('audio_s'):
+            MetricsService.AUDIO_SECONDS.observe(timings['audio_s'])
+        if timings.get('skipped_s'):
+            MetricsService.VAD_SKIPPED_SECONDS.inc(timings['skipped_s'])
+        MetricsService.INFERENCE_SECONDS.labels(model).observe(timings['inference_s'])
+        if timings.get('real_time_factor') is not None:
+            MetricsService.REAL_TIME_FACTOR.labels(model).observe(timings['real_time_factor'])
+
+    @staticmethod
+    def observe_llm_response(model: str, method: str, seconds: float, response: Optional[dict] = None):
+        """Record an Ollama call; ``response`` is the reply (or final streamed part) with eval stats."""
+        MetricsService.LLM_REQUEST_SECONDS.labels(model, method).observe(seconds)
+        if not response:
+            return
+        eval_count = response.get('eval_count')
+        eval_duration = response.get('eval_duration')  # nanoseconds
+        if eval_count and eval_duration:
+            MetricsService.LLM_TOKENS_PER_SECOND.labels(model).observe(eval_count / (eval_duration / 1e9))
+
+    @staticmethod
+    def render() -> Tuple[bytes, str]:
+        """The exposition text and its content type."""
+        if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+            from prometheus_client import multiprocess
+            registry = CollectorRegistry()
+            multiprocess.MultiProcessCollector(registry)
+            return generate_latest(registry), CONTENT_TYPE_LATEST
+        return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
@@ -0,0 +1,104 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Hashable, Optional
+
+class ModelRegistry:
+    """Thread-safe, bounded LRU pool of loaded models.
+
+    Models are loaded on first use by ``loader(*key)`` and kept warm until either
+    ``max_models`` or the memory budget is exceeded, at which point the least
+    recently used models are evicted. Concurrent requests for the same cold key
+    wait on a per-key lock so the model is only loaded once. ``on_event`` is
+    called as ``on_event('load' | 'evict', key, seconds)`` for metrics, and
+    ``sizer(model, key)`` reports a loaded model's size in bytes.
+    """
+
+    def __init__(self, loader: Callable, max_models: int = 2,
+                 memory_budget_bytes: Optional[int] = None,
+                 sizer: Optional[Callable[[object, Hashable], int]] = None,
+                 on_event: Optional[Callable[[str, Hashable, float], None]] = None):
+        self._loader = loader
+        self._on_event = on_event or (lambda event, key, seconds: None)
+        self._sizer = sizer or (lambda model, key: 0)
+        self.max_models = max_models
+        self.memory_budget_bytes = memory_budget_bytes
+
+        self._models = OrderedDict()  # key -> (model, size in bytes)
+        self._lock = threading.Lock()
+        self._load_locks = {}
+        self._stats = {'hits': 0, 'loads': 0, 'evictions': 0, 'load_seconds': 0.0}
+
+    def get(self, key: Hashable):
+        with self._lock:
+            if key in self._models:
+                self._models.move_to_end(key)
+                self._stats['hits'] += 1
+                return self._models[key][0]
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+
+        with load_lock:
+            # Another thread may have finished loading while we waited
+            with self._lock:
+                if key in self._models:
+                    self._models.move_to_end(key)
+                    self._stats['hits'] += 1
+                    return self._models[key][0]
+
+            started = time.perf_counter()
+            model = self._loader(*key)
+            elapsed = time.perf_counter() - started
+            size = self._sizer(model, key)
+            print(f"Loaded model {key} in {elapsed:.1f}s ({size / 1e6:.0f} MB)")
+
+            with self._lock:
+                self._models[key] = (model, size)
+                self._stats['loads'] += 1
+                self._stats['load_seconds'] += elapsed
+                evicted = self._evict(keep=key)
+            self._on_event('load', key, elapsed)
+            for evicted_key in evicted:
+                self._on_event('evict', evicted_key, 0.0)
+            return model
+
+    def evict(self, key: Hashable) -> bool:
+        with self._lock:
+            if self._models.pop(key, None) is None:
+                return False
+            self._stats['evictions'] += 1
+        self._on_event('evict', key, 0.0)
+        return True
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                **self._stats,
+                'warm': [
+                    {'key': list(key), 'bytes': size}
+                    for key, (_, size) in self._models.items()
+                ],
+                'total_bytes': self._total_bytes()
+            }
+
+    def _total_bytes(self) -> int:
+        return sum(size for _, size in self._models.values())
+
+    def _over_budget(self) -> bool:
+        if len(self._models) > self.max_models:
+            return True
+        return self.memory_budget_bytes is not None and self._total_bytes() > self.memory_budget_bytes
+
+    def _evict(self, keep: Hashable) -> list:
+        # Requests that already hold an evicted model keep using it; the
+        # memory is released once they finish.
+        evicted = []
+        for key in list(self._models):
+            if not self._over_budget():
+                break
+            if key == keep:
+                continue
+            del self._models[key]
+            self._stats['evictions'] += 1
+            evicted.append(key)
+            print(f"Evicted model {key}")
+        return evicted
@@ -1,6 +1,14 @@
-import ollama
-from typing import List, Optional
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, List, Optional
 from pathlib import Path
+from config import Config
+from app.services.cache_service import DiskCache
+from app.services.transcript_chunker import TranscriptChunker
+from app.services.note_repair_service import NoteRepairService
+from app.services.ollama_client import OllamaClient
+from app.services.metrics_service import MetricsService
 
 class NoteGenerationService:
     # Class variables for system messages and instructions
@@ -63,8 +71,102 @@ class NoteGenerationService:
         "please regenerate it following these requirements."
     )
 
+    UPDATE_INSTRUCTIONS = (
+        "\n\nUpdate the existing clinical note with new information from the conversation. "
+        "Maintain the existing structure while adding or modifying relevant details. "
+        "Ensure consistency between old and new information. "
+        "Remove any sections that does not have any information."
+        "Do not include any other text, only the note"
+    )
+
+    PARTIAL_INSTRUCTIONS = (
+        "\n\nNote: This is a partial conversation and the note will be updated with the new information afterwards."
+    )
+
+    MERGE_INSTRUCTIONS = (
+        "\n\nYou will be given several partial clinical notes, each written from a consecutive "
+        "part of the same conversation, in order. Merge them into a single clinical note. "
+        "Combine information for the same section, keep later details when they update earlier ones, "
+        "remove duplicates, and remove any sections that do not have any information. "
+        "Do not include any other text, only the note"
+    )
+
+    # Prefix of the user turn that carries each additional chunk
+    UPDATE_PROMPT = "Update the note with this additional conversation: "
+
+    # 'refine' updates one note chunk by chunk; 'map_reduce' writes a partial
+    # note per chunk concurrently and merges them in a single pass;
+    # 'incremental' is refine that reuses the model's KV context between chunks
+    STRATEGIES = ('refine', 'map_reduce', 'incremental')
+
+    _note_cache = None
+    _note_cache_lock = threading.Lock()
+
+    @staticmethod
+    def prompt_version(strategy: str = 'refine') -> str:
+        """Hash of the prompts a strategy uses; editing one only changes the cache keys of strategies using it."""
+        prompts = [
+            NoteGenerationService.SYSTEM_MESSAGE['content'],
+            NoteGenerationService.PARTIAL_INSTRUCTIONS,
+            NoteGenerationService.CLEANING_INSTRUCTIONS
+        ]
+        if strategy == 'map_reduce':
+            prompts.append(NoteGenerationService.MERGE_INSTRUCTIONS)
+        else:
+            prompts.extend([NoteGenerationService.UPDATE_INSTRUCTIONS, NoteGenerationService.UPDATE_PROMPT])
+        return DiskCache.make_key(*prompts)[:16]
+
+    @classmethod
+    def get_note_cache(cls) -> DiskCache:
+        with cls._note_cache_lock:
+            if cls._note_cache is None:
+                cls._note_cache = DiskCache(
+                    Config.NOTE_CACHE_DIR,
+                    Config.NOTE_CACHE_MAX_MB * 1024 * 1024
+                )
+            return cls._note_cache
+
+    @staticmethod
+    def note_cache_key(transcript: str, model: str, chunking: dict, options: Optional[dict] = None) -> str:
+        return DiskCache.make_key(
+            'note',
+            DiskCache.hash_text(transcript),
+            model,
+            NoteGenerationService.prompt_version(chunking['strategy']),
+            chunking,
+            options or {},
+            # Post-processing also shapes the cached note
+            {'repair': NoteRepairService.VERSION, 'clean_max_retries': Config.NOTE_CLEAN_MAX_RETRIES}
+        )
+
+    @staticmethod
+    def chat(model: str, messages: List[dict], options: Optional[dict] = None,
+             token_callback: Optional[Callable[[str], None]] = None) -> str:
+        """Send a chat request and return the reply text.
+        
+        With a token_callback the reply is streamed and each piece is passed to
+        the callback as soon as Ollama produces it.
+        """
+        if token_callback is None:
+            response = OllamaClient.chat(
+                model=model,
+                messages=messages,
+                options=options
+            )
+            return response['message']['content']
+
+        pieces = []
+        for part in OllamaClient.chat(model=model, messages=messages, options=options, stream=True):
+            piece = part['message']['content']
+            if piece:
+                pieces.append(piece)
+                token_callback(piece)
+        return ''.join(pieces)
+
     @staticmethod
-    def generate_note(transcript: str, model: str, previous_note: str = None, is_complete: bool = True) -> str:
+    def generate_note(transcript: str, model: str, previous_note: str = None, is_complete: bool = True,
+                      options: Optional[dict] = None,
+                      token_callback: Optional[Callable[[str], None]] = None) -> str:
         """Generate a SOAP note from a medical transcript.
         
         Args:
@@ -72,23 +174,17 @@ class NoteGenerationService:
             model: The LLM model to use
             previous_note: Optional previous SOAP note to update
             is_complete: Whether this is a complete transcript (default: True)
+            options: Optional Ollama generation options (temperature, num_ctx, ...)
+            token_callback: Optional callable that receives the note as it is streamed
         """
         try:
             system_message = NoteGenerationService.SYSTEM_MESSAGE.copy()
 
             if previous_note:
-                system_message['content'] += (
-                    "\n\nUpdate the existing clinical note with new information from the conversation. "
-                    "Maintain the existing structure while adding or modifying relevant details. "
-                    "Ensure consistency between old and new information. "
-                    "Remove any sections that does not have any information."
-                    "Do not include any other text, only the note"
-                )
+                system_message['content'] += NoteGenerationService.UPDATE_INSTRUCTIONS
 
             if not is_complete:
-                system_message['content'] += (
-                    "\n\nNote: This is a partial conversation and the note will be updated with the new information afterwards."
-                )
+                system_message['content'] += NoteGenerationService.PARTIAL_INSTRUCTIONS
 
             messages = [system_message]
 
@@ -100,79 +196,99 @@ class NoteGenerationService:
 
             messages.append({
                 'role': 'user',
-                'content': f"{'Update the note with this additional conversation: ' if previous_note else ''}{transcript}"
+                'content': f"{NoteGenerationService.UPDATE_PROMPT if previous_note else ''}{transcript}"
             })
 
-            response = ollama.chat(
-                model=model,
-                messages=messages
-            )
-            
-            note_content = response['message']['content']
+            note_content = NoteGenerationService.chat(model, messages, options, token_callback)
             
             return note_content
         except Exception as e:
             raise Exception(f"Note generation failed: {str(e)}")
 
     @staticmethod
-    def split_transcript(transcript: str, max_words: int = 600) -> List[str]:
-        """Split transcript into chunks of maximum word length."""
-        words = transcript.split()
-        chunks = []
+    def tokenizer_spec(model: Optional[str]) -> str:
+        """Tokenizer for a model: the longest matching prefix in Config.NOTE_TOKENIZERS, else the default."""
+        matches = [prefix for prefix in Config.NOTE_TOKENIZERS if model and model.startswith(prefix)]
+        if matches:
+            return Config.NOTE_TOKENIZERS[max(matches, key=len)]
+        return Config.NOTE_TOKENIZER
+
+    @staticmethod
+    def chunking_params(model: Optional[str], strategy: str = 'refine') -> dict:
+        """Token budget for transcript chunks, sized to what is left of the context window.
         
-        for i in range(0, len(words), max_words):
-            chunk = ' '.join(words[i:i + max_words])
-            chunks.append(chunk)
+        Each call carries the system prompt, the generated output and, for the refine
+        and incremental strategies, the previous note; whatever remains of
+        NOTE_CONTEXT_WINDOW goes to the transcript chunk. Incremental runs use the same
+        chunks as refine and only carry Ollama's context while it fits in OLLAMA_NUM_CTX.
+        """
+        chunker = TranscriptChunker.get(NoteGenerationService.tokenizer_spec(model))
+
+        system_prompt = NoteGenerationService.SYSTEM_MESSAGE['content'] + NoteGenerationService.PARTIAL_INSTRUCTIONS
+        reserved = Config.NOTE_OUTPUT_TOKENS + Config.NOTE_PROMPT_MARGIN_TOKENS
+        if strategy in ('refine', 'incremental'):
+            system_prompt += NoteGenerationService.UPDATE_INSTRUCTIONS
+            reserved += Config.NOTE_PREVIOUS_NOTE_TOKENS
+
+        max_tokens = Config.NOTE_CONTEXT_WINDOW - chunker.count_tokens(system_prompt) - reserved
+        if Config.NOTE_MAX_CHUNK_TOKENS:
+            max_tokens = min(max_tokens, Config.NOTE_MAX_CHUNK_TOKENS)
+
+        return {
+            'tokenizer': chunker.spec,
+            'context_window': Config.NOTE_CONTEXT_WINDOW,
+            'max_tokens': max(max_tokens, Config.NOTE_MIN_CHUNK_TOKENS),
+            'overlap_tokens': Config.NOTE_CHUNK_OVERLAP_TOKENS,
+            'strategy': strategy
+        }
+
+    @staticmethod
+    def split_transcript(transcript: str, model: Optional[str] = None, strategy: str = 'refine',
+                         chunking: Optional[dict] = None) -> List[str]:
+        """Split transcript into token-budgeted chunks at sentence and speaker-turn boundaries.
         
-        return chunks
+        Args:
+            transcript: The transcript text
+            model: Model whose tokenizer and context window size the chunks
+            strategy: Note generation strategy the chunks are budgeted for
+            chunking: Parameters from chunking_params, when the caller already has them
+        """
+        chunking = chunking or NoteGenerationService.chunking_params(model, strategy)
+        chunker = TranscriptChunker.get(chunking['tokenizer'])
+        return chunker.chunk(
+            transcript,
+            max_tokens=chunking['max_tokens'],
+            overlap_tokens=chunking['overlap_tokens']
+        ) or [transcript]
 
     @staticmethod
-    def clean_note(cleaned_note: str, model: str) -> str:
+    def clean_note(cleaned_note: str, model: str, token_callback: Optional[Callable[[str], None]] = None,
+                   max_retries: Optional[int] = None, options: Optional[dict] = None) -> str:
         """Clean a generated note by removing incomplete sections and ensuring proper format.
         
+        Local repairs (NoteRepairService) run first; the LLM is only asked to fix the
+        note when issues remain, at most ``max_retries`` times.
+        
         Args:
             cleaned_note: The note to clean
             model: The LLM model to use for cleaning
+            token_callback: Optional callable that receives regenerated notes as they are streamed
+            max_retries: LLM cleaning attempts allowed (default: Config.NOTE_CLEAN_MAX_RETRIES)
+            options: Optional Ollama generation options, the same ones the note was generated with
             
         Returns:
             str: The cleaned note
         """
+        if max_retries is None:
+            max_retries = Config.NOTE_CLEAN_MAX_RETRIES
         
-        # Remove reasoning tokens for deepseek models
-        if "</think>" in cleaned_note:
-            cleaned_note = cleaned_note.split("</think>", 1)[1].strip()
-        
-        # Strip formatting from the start of the note
-        cleaned_note = cleaned_note.strip()
-        if cleaned_note.startswith('```plaintext'):
-            cleaned_note = cleaned_note[12:].strip()
-        elif cleaned_note.startswith('```'):
-            cleaned_note = cleaned_note[3:].strip()
-        
-        patient_info_index = cleaned_note.lower().find("patient information")
-        if patient_info_index > 0:
-            next_chars = cleaned_note[patient_info_index + len("patient information"):patient_info_index + len("patient information") + 4]
-            if '**' in next_chars:
-                cleaned_note = '**' + cleaned_note[patient_info_index:]
-            else:
-                cleaned_note = cleaned_note[patient_info_index:]
-        
-        # Check for issues and provide specific feedback
-        issues = []
-        
-        # Normalize the start of the note for comparison
-        normalized_start = cleaned_note.strip().lower()
-        normalized_start = normalized_start.replace('*', '').replace('#', '').replace('**', '').replace('_', '')
+        cleaned_note, issues = NoteRepairService.repair(cleaned_note)
         
-        if not normalized_start.startswith("patient information"):
-            issues.append(f"The note starts with '{cleaned_note[:50]}...' instead of 'Patient information'")
-        
-        if "[Incomplete]" in cleaned_note:
-            incomplete_sections = [line for line in cleaned_note.split('\n') if "[Incomplete]" in line]
-            issues.append(f"The following sections includes [Incomplete]. It should be removed: {', '.join(incomplete_sections)}")
-        
-        if issues:
-            print(f"Found issues in note: {'; '.join(issues)}")
+        attempts = 0
+        while issues and attempts < max_retries:
+            attempts += 1
+            NoteRepairService.record('llm_retry')
+            print(f"Found issues in note (LLM cleaning attempt {attempts}/{max_retries}): {'; '.join(issues)}")
             feedback_message = (
                 f"Please fix the following issues in the note:\n"
                 f"{'; '.join(issues)}\n\n"
@@ -183,29 +299,226 @@ class NoteGenerationService:
                 {'role': 'user', 'content': feedback_message}
             ]
             
-            response = ollama.chat(
-                model=model,
-                messages=messages
-            )
-            
-            cleaned_note = response['message']['content']
+            regenerated = NoteGenerationService.chat(model, messages, options, token_callback=token_callback)
+            cleaned_note, issues = NoteRepairService.repair(regenerated)
+        
+        MetricsService.NOTE_CLEAN_RETRIES.observe(attempts)
+        if issues:
+            NoteRepairService.record('retry_budget_exhausted')
+            print(f"Returning note with unresolved issues after {attempts} LLM attempts: {'; '.join(issues)}")
+        
+        return cleaned_note
+
+    @staticmethod
+    def refine_note(transcript_chunks: List[str], model: str, options: Optional[dict] = None,
+                    progress_callback: Optional[Callable[..., None]] = None,
+                    token_callback: Optional[Callable[[str], None]] = None) -> str:
+        """Build the note chunk by chunk, passing the previous note into each update."""
+        current_soap_note = None
+        
+        # Process each chunk sequentially
+        for i, chunk in enumerate(transcript_chunks):
+            is_last_chunk = i == len(transcript_chunks) - 1
             
-            # Remove reasoning tokens for deepseek models
-            if "deepseek" in model and "</think>" in cleaned_note:
-                cleaned_note = cleaned_note.split("</think>", 1)[1].strip()
+            if progress_callback:
+                progress_callback('chunk', current=i + 1, total=len(transcript_chunks))
             
-            # Recursively check again
-            return NoteGenerationService.clean_note(cleaned_note, model)
+            # Generate or update SOAP note
+            started = time.perf_counter()
+            current_soap_note = NoteGenerationService.generate_note(
+                transcript=chunk,
+                model=model,
+                previous_note=current_soap_note,
+                is_complete=is_last_chunk,
+                options=options,
+                token_callback=token_callback
+            )
+            MetricsService.NOTE_CHUNK_SECONDS.labels('refine').observe(time.perf_counter() - started)
         
-        return cleaned_note
+        return current_soap_note
+
+    @staticmethod
+    def generate_with_context(model: str, prompt: str, system: Optional[str] = None,
+                              context: Optional[List[int]] = None, options: Optional[dict] = None,
+                              token_callback: Optional[Callable[[str], None]] = None) -> tuple:
+        """Run ``generate`` continuing from a previous ``context`` and return (text, response).
+        
+        The returned response carries the new ``context`` (the token ids of the whole
+        exchange so far) and Ollama's prompt_eval_count.
+        """
+        if token_callback is None:
+            response = OllamaClient.generate(
+                model=model,
+                prompt=prompt,
+                system=system,
+                context=context,
+                options=options
+            )
+            return response['response'], response
+
+        pieces = []
+        final = None
+        for part in OllamaClient.generate(model=model, prompt=prompt, system=system, context=context,
+                                          options=options, stream=True):
+            piece = part['response']
+            if piece:
+                pieces.append(piece)
+                token_callback(piece)
+            if part.get('done'):
+                final = part
+        return ''.join(pieces), final or {}
+
+    @staticmethod
+    def incremental_note(transcript_chunks: List[str], model: str, options: Optional[dict] = None,
+                         progress_callback: Optional[Callable[..., None]] = None,
+                         token_callback: Optional[Callable[[str], None]] = None) -> str:
+        """Refine the note chunk by chunk, carrying Ollama's ``context`` between passes.
+        
+        Each pass continues the previous exchange, so Ollama only encodes the new
+        transcript text instead of re-reading the system prompt and previous note.
+        When the context would no longer fit the window the conversation is restarted
+        from the current note, like a refine pass.
+        """
+        chunker = TranscriptChunker.get(NoteGenerationService.tokenizer_spec(model))
+        context_window = (options or {}).get('num_ctx', Config.OLLAMA_NUM_CTX)
+
+        note = None
+        context = None
+        for i, chunk in enumerate(transcript_chunks):
+            is_last_chunk = i == len(transcript_chunks) - 1
+            if progress_callback:
+                progress_callback('chunk', current=i + 1, total=len(transcript_chunks))
+
+            suffix = '' if is_last_chunk else NoteGenerationService.PARTIAL_INSTRUCTIONS
+            if context is not None:
+                prompt = (
+                    f"{NoteGenerationService.UPDATE_INSTRUCTIONS.strip()}{suffix}\n\n"
+                    f"{NoteGenerationService.UPDATE_PROMPT}{chunk}"
+                )
+                needed = len(context) + chunker.count_tokens(prompt) + Config.NOTE_OUTPUT_TOKENS
+                if needed > context_window:
+                    print(f"Context of {len(context)} tokens would overflow the window; restarting from the note")
+                    context = None
+
+            if context is None:
+                system = NoteGenerationService.SYSTEM_MESSAGE['content']
+                if note:
+                    system += NoteGenerationService.UPDATE_INSTRUCTIONS
+                    prompt = f"Current note:\n{note}\n\n{NoteGenerationService.UPDATE_PROMPT}{chunk}"
+                else:
+                    prompt = chunk
+                system += suffix
+            else:
+                system = None
+
+            started = time.perf_counter()
+            try:
+                note, response = NoteGenerationService.generate_with_context(
+                    model, prompt, system, context, options, token_callback
+                )
+            except Exception as e:
+                raise Exception(f"Note generation failed: {str(e)}")
+            MetricsService.NOTE_CHUNK_SECONDS.labels('incremental').observe(time.perf_counter() - started)
+
+            context = response.get('context')
+            print(f"Chunk {i + 1}/{len(transcript_chunks)}: encoded {response.get('prompt_eval_count')} prompt tokens"
+                  f"{' (continued context)' if system is None else ''}")
+
+        return note
+
+    @staticmethod
+    def merge_notes(partial_notes: List[str], model: str, options: Optional[dict] = None,
+                    token_callback: Optional[Callable[[str], None]] = None) -> str:
+        """Merge partial notes (one per transcript chunk, in order) into a single note."""
+        try:
+            system_message = NoteGenerationService.SYSTEM_MESSAGE.copy()
+            system_message['content'] += NoteGenerationService.MERGE_INSTRUCTIONS
+
+            partials = "\n\n".join(
+                f"Partial note {i + 1}:\n{note}" for i, note in enumerate(partial_notes)
+            )
+            messages = [
+                system_message,
+                {'role': 'user', 'content': partials}
+            ]
+
+            return NoteGenerationService.chat(model, messages, options, token_callback)
+        except Exception as e:
+            raise Exception(f"Note merging failed: {str(e)}")
 
     @staticmethod
-    def generate_note_from_transcript(transcript: str, model: str) -> str:
+    def map_reduce_note(transcript_chunks: List[str], model: str, options: Optional[dict] = None,
+                        progress_callback: Optional[Callable[..., None]] = None,
+                        token_callback: Optional[Callable[[str], None]] = None) -> str:
+        """Write a partial note for every chunk concurrently, then merge them in one pass.
+        
+        Unlike the refine loop, no call waits on the previous chunk's note, so with
+        enough Ollama capacity (OLLAMA_NUM_PARALLEL, several GPUs or hosts) latency
+        is roughly one chunk plus the merge instead of one call per chunk. Partial
+        notes are generated concurrently, so only the merge pass is streamed.
+        """
+        if len(transcript_chunks) == 1:
+            if progress_callback:
+                progress_callback('chunk', current=1, total=1)
+            return NoteGenerationService.generate_note(
+                transcript=transcript_chunks[0],
+                model=model,
+                options=options,
+                token_callback=token_callback
+            )
+
+        def partial_note(chunk):
+            started = time.perf_counter()
+            note = NoteGenerationService.generate_note(
+                transcript=chunk,
+                model=model,
+                is_complete=False,
+                options=options
+            )
+            MetricsService.NOTE_CHUNK_SECONDS.labels('map_reduce').observe(time.perf_counter() - started)
+            return note
+
+        partial_notes = [None] * len(transcript_chunks)
+        workers = max(1, min(Config.NOTE_MAP_WORKERS, len(transcript_chunks)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='note-map') as executor:
+            futures = {
+                executor.submit(partial_note, chunk): i
+                for i, chunk in enumerate(transcript_chunks)
+            }
+            for completed, future in enumerate(as_completed(futures), start=1):
+                partial_notes[futures[future]] = future.result()
+                if progress_callback:
+                    progress_callback('chunk', current=completed, total=len(transcript_chunks))
+
+        if progress_callback:
+            progress_callback('merging')
+
+        return NoteGenerationService.merge_notes(partial_notes, model, options, token_callback)
+
+    @staticmethod
+    def generate_note_from_transcript(transcript: str, model: str,
+                                      progress_callback: Optional[Callable[..., None]] = None,
+                                      options: Optional[dict] = None,
+                                      use_cache: bool = True,
+                                      strategy: str = 'refine',
+                                      token_callback: Optional[Callable[[str], None]] = None) -> str:
         """Generate a complete SOAP note from a transcript, handling splitting and incremental updates.
         
+        Finished notes are cached on the transcript hash, model, the strategy's prompt
+        version, chunking parameters, generation options and the repair version, so resubmitting the same
+        transcript with the same model returns without calling the LLM.
+        
         Args:
             transcript: The complete transcript text
             model: The model to use for generation
+            progress_callback: Optional callable invoked as ``progress_callback(stage, **details)``
+                with stage 'chunk' (current, total) before each chunk and 'cleaning' before cleanup
+            options: Optional Ollama generation options
+            use_cache: Look up and store the note in the note cache
+            strategy: 'refine' (sequential updates), 'map_reduce' (concurrent partial notes plus a merge)
+                or 'incremental' (sequential updates reusing the model's KV context)
+            token_callback: Optional callable that receives generated text as it is streamed;
+                each pass (chunk, merge, cleaning) streams a full replacement note
             
         Returns:
             str: The complete SOAP note
@@ -214,26 +527,57 @@ class NoteGenerationService:
             Exception: If note generation fails
         """
         try:
-            print(f"Generating note with model: {model}")
+            if strategy not in NoteGenerationService.STRATEGIES:
+                raise ValueError(f"Unknown strategy '{strategy}'")
+
+            # The window every call for this model runs with (see OllamaClient._request)
+            options = {'num_ctx': Config.OLLAMA_NUM_CTX, **(options or {})}
+            chunking = NoteGenerationService.chunking_params(model, strategy)
+
+            cache_key = None
+            if use_cache and Config.NOTE_CACHE_ENABLED:
+                started = time.perf_counter()
+                cache_key = NoteGenerationService.note_cache_key(transcript, model, chunking, options)
+                cached = NoteGenerationService.get_note_cache().get(cache_key)
+                if cached is not None:
+                    print(f"Note cache hit for model {model} ({(time.perf_counter() - started) * 1000:.1f} ms)")
+                    return cached['note']
+
+            print(f"Generating note with model: {model} ({strategy})")
 
             # Split transcript into chunks
-            transcript_chunks = NoteGenerationService.split_transcript(transcript)
-            
-            current_soap_note = None
+            transcript_chunks = NoteGenerationService.split_transcript(transcript, model, strategy, chunking)
             
-            # Process each chunk sequentially
-            for i, chunk in enumerate(transcript_chunks):
-                is_last_chunk = i == len(transcript_chunks) - 1
+            # Keep this note's sequential passes on one Ollama host, where the
+            # incremental context and the prompt cache live; map_reduce partials
+            # run on other threads and are still spread over the hosts
+            with OllamaClient.pinned_host(model):
+                if strategy == 'map_reduce':
+                    current_soap_note = NoteGenerationService.map_reduce_note(
+                        transcript_chunks, model, options, progress_callback, token_callback
+                    )
+                elif strategy == 'incremental':
+                    current_soap_note = NoteGenerationService.incremental_note(
+                        transcript_chunks, model, options, progress_callback, token_callback
+                    )
+                else:
+                    current_soap_note = NoteGenerationService.refine_note(
+                        transcript_chunks, model, options, progress_callback, token_callback
+                    )
                 
-                # Generate or update SOAP note
-                current_soap_note = NoteGenerationService.generate_note(
-                    transcript=chunk,
-                    model=model,
-                    previous_note=current_soap_note,
-                    is_complete=is_last_chunk
-                )
+                if progress_callback:
+                    progress_callback('cleaning')
+                
+                note = NoteGenerationService.clean_note(current_soap_note, model, token_callback, options=options)
+            
+            if cache_key is not None:
+                NoteGenerationService.get_note_cache().set(cache_key, {
+                    'note': note,
+                    'model': model,
+                    'prompt_version': NoteGenerationService.prompt_version(strategy)
+                })
             
-            return NoteGenerationService.clean_note(current_soap_note, model)
+            return note
             
         except Exception as e:
             raise Exception(f"Failed to generate note from transcript: {str(e)}")
\ No newline at end of file
@@ -0,0 +1,191 @@
+import re
+import threading
+from collections import Counter
+from typing import List, Tuple
+
+class NoteRepairService:
+    """Deterministic clean-up of generated notes.
+
+    Handles the common ways a model's output misses the note format (reasoning
+    blocks, code fences, preambles, [Incomplete] sections, inconsistent heading
+    markup) without another LLM round trip. Each repair that fires is counted so
+    we can see which problems the models actually produce.
+    """
+
+    SECTION_NAMES = (
+        'patient information', 'chief complaint', 'cc', 'duration of follow-up',
+        'history of present illness', 'hpi', 'review of systems', 'ros',
+        'past medical history', 'pmhx', 'past surgical history', 'medications',
+        'current medications', 'allergies', 'family history', 'social history',
+        'family and social history', 'subjective', 'objective', 'vital signs',
+        'physical examination', 'physical exam', 'laboratory', 'imaging',
+        'assessment', 'diagnosis', 'plan', 'follow-up', 'patient education'
+    )
+
+    # A line that is only a heading: optional markdown '#'s or bold/underline
+    # markers around a short title, optionally followed by a colon
+    HEADING_PATTERN = re.compile(
+        r'^\s*(?P<hashes>#{1,6}\s*)?(?P<open>\*\*|__)?\s*(?P<title>[A-Za-z][\w /&(),.-]{1,80}?)'
+        r'\s*(?P<colon>:)?\s*(?P<close>\*\*|__)?\s*(?P<trailing_colon>:)?\s*$'
+    )
+    ABBREVIATION_PATTERN = re.compile(r'\s*\([^)]*\)$')
+    THINK_PATTERN = re.compile(r'<think>.*?</think>', re.DOTALL | re.IGNORECASE)
+    FENCE_PATTERN = re.compile(r'^\s*```[\w-]*\s*$')
+
+    # Part of the note cache key; bump whenever a change here alters repaired notes
+    VERSION = 2
+
+    _stats = Counter()
+    _lock = threading.Lock()
+
+    @classmethod
+    def record(cls, path: str, count: int = 1):
+        with cls._lock:
+            cls._stats[path] += count
+
+    @classmethod
+    def stats(cls) -> dict:
+        with cls._lock:
+            return dict(cls._stats)
+
+    @classmethod
+    def section_title(cls, line: str):
+        """Return the title if the line is a known section heading, else None.
+
+        Only lines with explicit heading markup ('#', '**'/'__' on both sides) or a
+        trailing colon count, and the title must be a section name, optionally
+        followed by its abbreviation ("History of Present Illness (HPI)"), so
+        content such as "Follow-up in 2 weeks." is never taken for a heading.
+        """
+        match = cls.HEADING_PATTERN.match(line)
+        if not match:
+            return None
+        explicit = (
+            match.group('hashes')
+            or (match.group('open') and match.group('close'))
+            or match.group('colon')
+            or match.group('trailing_colon')
+        )
+        if not explicit:
+            return None
+        title = match.group('title').strip()
+        if cls.ABBREVIATION_PATTERN.sub('', title).lower() in cls.SECTION_NAMES:
+            return title
+        return None
+
+    @classmethod
+    def strip_reasoning(cls, note: str) -> str:
+        if '</think>' not in note:
+            return note
+        cls.record('strip_think')
+        note = cls.THINK_PATTERN.sub('', note)
+        # An unmatched closing tag means the opening tag was cut off
+        if '</think>' in note:
+            note = note.split('</think>', 1)[1]
+        return note.strip()
+
+    @classmethod
+    def strip_code_fences(cls, note: str) -> str:
+        lines = note.split('\n')
+        kept = [line for line in lines if not cls.FENCE_PATTERN.match(line)]
+        if len(kept) != len(lines):
+            cls.record('strip_code_fence')
+        return '\n'.join(kept).strip()
+
+    @classmethod
+    def strip_preamble(cls, note: str) -> str:
+        stripped = cls._strip_preamble(note)
+        if stripped != note:
+            cls.record('strip_preamble')
+        return stripped
+
+    @classmethod
+    def _strip_preamble(cls, note: str) -> str:
+        lines = note.split('\n')
+        for i, line in enumerate(lines):
+            title = cls.section_title(line)
+            if title and title.lower().startswith('patient information'):
+                return '\n'.join(lines[i:]).strip()
+
+        # Heading text embedded in a line ("Sure! Here is the note: **Patient information**")
+        index = note.lower().find('patient information')
+        if index > 0:
+            prefix = '**' if '**' in note[index + len('patient information'):index + len('patient information') + 4] else ''
+            return prefix + note[index:]
+        return note
+
+    @classmethod
+    def drop_incomplete_sections(cls, note: str) -> str:
+        if '[incomplete]' not in note.lower():
+            return note
+
+        sections = []
+        for line in note.split('\n'):
+            if cls.section_title(line) or not sections:
+                sections.append([line])
+            else:
+                sections[-1].append(line)
+
+        kept = []
+        for section in sections:
+            text = '\n'.join(section)
+            if '[incomplete]' not in text.lower():
+                kept.append(text)
+                continue
+            body = [line for line in section[1:] if line.strip()]
+            if cls.section_title(section[0]) and all('[incomplete]' in line.lower() for line in body):
+                # A confirmed heading whose body is nothing but [Incomplete]
+                cls.record('drop_incomplete_section')
+                continue
+            # Otherwise drop only the offending lines, keeping any real content
+            cls.record('drop_incomplete_line')
+            kept.append('\n'.join(line for line in section if '[incomplete]' not in line.lower()))
+
+        return '\n'.join(kept).strip()
+
+    @classmethod
+    def normalize_headings(cls, note: str) -> str:
+        lines = note.split('\n')
+        changed = False
+        for i, line in enumerate(lines):
+            title = cls.section_title(line)
+            if title is None:
+                continue
+            normalized = f"**{title}**"
+            if line.strip() != normalized:
+                lines[i] = normalized
+                changed = True
+        if changed:
+            cls.record('normalize_headings')
+        return '\n'.join(lines)
+
+    @classmethod
+    def find_issues(cls, note: str) -> List[str]:
+        issues = []
+
+        # Normalize the start of the note for comparison
+        normalized_start = note.strip().lower()
+        normalized_start = normalized_start.replace('*', '').replace('#', '').replace('_', '')
+        if not normalized_start.startswith("patient information"):
+            issues.append(f"The note starts with '{note[:50]}...' instead of 'Patient information'")
+
+        if "[incomplete]" in note.lower():
+            incomplete_sections = [line for line in note.split('\n') if "[incomplete]" in line.lower()]
+            issues.append(f"The following sections includes [Incomplete]. It should be removed: {', '.join(incomplete_sections)}")
+
+        return issues
+
+    @classmethod
+    def repair(cls, note: str) -> Tuple[str, List[str]]:
+        """Apply every local repair and return the note with any issues that remain."""
+        cls.record('notes_checked')
+        note = cls.strip_reasoning(note or '')
+        note = cls.strip_code_fences(note)
+        note = cls.strip_preamble(note)
+        note = cls.drop_incomplete_sections(note)
+        note = cls.normalize_headings(note)
+
+        issues = cls.find_issues(note)
+        if issues:
+            cls.record('unresolved')
+        return note, issues
@@ -0,0 +1,154 @@
+import itertools
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+import httpx
+import ollama
+from config import Config
+from app.services.metrics_service import MetricsService
+
+class OllamaClient:
+    """Shared Ollama access for the app and the scripts.
+
+    - One ``ollama.Client`` (and so one pooled HTTP connection set) per host
+    - Requests for a model are spread round-robin over ``OLLAMA_HOSTS``, unless
+      the calling thread is inside ``pinned_host``
+    - A semaphore per (host, model) caps concurrent requests so a burst of
+      jobs queues here instead of thrashing the server
+    - Connection failures and 5xx/429 responses are retried with exponential backoff
+    - ``keep_alive`` is sent with every request so models stay resident between calls
+    """
+
+    RETRYABLE_STATUS = (429, 500, 502, 503, 504)
+
+    _clients: Dict[str, ollama.Client] = {}
+    _semaphores: Dict[tuple, threading.BoundedSemaphore] = {}
+    _host_cycles: Dict[str, Iterator[str]] = {}
+    _pinned = threading.local()
+    _lock = threading.Lock()
+
+    @classmethod
+    def get_client(cls, host: str) -> ollama.Client:
+        with cls._lock:
+            if host not in cls._clients:
+                cls._clients[host] = ollama.Client(host=host, timeout=Config.OLLAMA_TIMEOUT)
+            return cls._clients[host]
+
+    @classmethod
+    def pick_host(cls, model: str) -> str:
+        pinned = getattr(cls._pinned, 'hosts', {}).get(model)
+        if pinned:
+            return pinned
+        with cls._lock:
+            if model not in cls._host_cycles:
+                cls._host_cycles[model] = itertools.cycle(Config.OLLAMA_HOSTS)
+            return next(cls._host_cycles[model])
+
+    @classmethod
+    @contextmanager
+    def pinned_host(cls, model: str):
+        """Send this thread's requests for ``model`` to a single host until the block exits.
+
+        Needed when calls depend on state held by one server, such as a
+        ``context`` returned by generate.
+        """
+        hosts = getattr(cls._pinned, 'hosts', None)
+        if hosts is None:
+            hosts = cls._pinned.hosts = {}
+        if model in hosts:
+            # Already pinned by an enclosing block
+            yield hosts[model]
+            return
+        hosts[model] = cls.pick_host(model)
+        try:
+            yield hosts[model]
+        finally:
+            del hosts[model]
+
+    @classmethod
+    def get_semaphore(cls, host: str, model: str) -> threading.BoundedSemaphore:
+        with cls._lock:
+            key = (host, model)
+            if key not in cls._semaphores:
+                limit = Config.OLLAMA_MODEL_LIMITS.get(model, Config.OLLAMA_MODEL_CONCURRENCY)
+                cls._semaphores[key] = threading.BoundedSemaphore(max(1, limit))
+            return cls._semaphores[key]
+
+    @classmethod
+    def _is_retryable(cls, error: Exception) -> bool:
+        if isinstance(error, ollama.ResponseError):
+            return error.status_code in cls.RETRYABLE_STATUS
+        return isinstance(error, (httpx.TransportError, ConnectionError))
+
+    @classmethod
+    def _backoff(cls, attempt: int):
+        delay = min(Config.OLLAMA_RETRY_BACKOFF * (2 ** attempt), 30.0)
+        time.sleep(delay * (0.5 + random.random() / 2))
+
+    @classmethod
+    def _request(cls, method: str, model: str, stream: bool, **kwargs):
+        kwargs.setdefault('keep_alive', Config.OLLAMA_KEEP_ALIVE)
+        # Ollama reloads a model whenever num_ctx changes, so every call asks for the same window
+        kwargs['options'] = {'num_ctx': Config.OLLAMA_NUM_CTX, **(kwargs.get('options') or {})}
+        if stream:
+            return cls._stream(method, model, **kwargs)
+
+        attempt = 0
+        while True:
+            host = cls.pick_host(model)
+            try:
+                with cls.get_semaphore(host, model):
+                    started = time.perf_counter()
+                    response = getattr(cls.get_client(host), method)(model=model, **kwargs)
+                MetricsService.observe_llm_response(model, method, time.perf_counter() - started, response)
+                return response
+            except Exception as e:
+                if attempt >= Config.OLLAMA_MAX_RETRIES or not cls._is_retryable(e):
+                    MetricsService.LLM_FAILURES.labels(model, method).inc()
+                    raise
+                print(f"Ollama {method} on {host} failed ({str(e)}); retrying")
+                cls._backoff(attempt)
+                attempt += 1
+
+    @classmethod
+    def _stream(cls, method: str, model: str, **kwargs):
+        # Only retried until the first part arrives; after that a retry would
+        # replay text the caller has already consumed
+        attempt = 0
+        while True:
+            host = cls.pick_host(model)
+            semaphore = cls.get_semaphore(host, model)
+            semaphore.acquire()
+            started = False
+            request_started = time.perf_counter()
+            try:
+                for part in getattr(cls.get_client(host), method)(model=model, stream=True, **kwargs):
+                    started = True
+                    if part.get('done'):
+                        MetricsService.observe_llm_response(
+                            model, method, time.perf_counter() - request_started, part
+                        )
+                    yield part
+                return
+            except Exception as e:
+                if started or attempt >= Config.OLLAMA_MAX_RETRIES or not cls._is_retryable(e):
+                    MetricsService.LLM_FAILURES.labels(model, method).inc()
+                    raise
+                print(f"Ollama {method} stream on {host} failed ({str(e)}); retrying")
+            finally:
+                semaphore.release()
+            cls._backoff(attempt)
+            attempt += 1
+
+    @classmethod
+    def chat(cls, model: str, messages: list, options: Optional[dict] = None, stream: bool = False, **kwargs):
+        """``ollama.chat`` through the shared client layer."""
+        return cls._request('chat', model, stream, messages=messages, options=options, **kwargs)
+
+    @classmethod
+    def generate(cls, model: str, prompt: str = '', system: Optional[str] = None,
+                 options: Optional[dict] = None, stream: bool = False, **kwargs):
+        """``ollama.generate`` through the shared client layer."""
+        return cls._request('generate', model, stream, prompt=prompt, system=system, options=options, **kwargs)
@@ -0,0 +1,212 @@
+import os
+import threading
+import time
+from typing import Dict, List, Tuple
+
+class RetentionService:
+    """Keeps the upload folder bounded.
+
+    Recordings, .txt transcripts and partial uploads each expire after their own
+    TTL, and when the folder exceeds its quota the oldest files are evicted
+    first. Recordings that are still being processed are pinned (together with
+    their transcript) by an ``.inuse`` marker file, which works across worker
+    processes.
+    """
+
+    PIN_SUFFIX = '.inuse'
+
+    _lock = threading.Lock()
+    _thread = None
+    _thread_pid = None
+    _stats = {'sweeps': 0, 'files_removed': 0, 'bytes_reclaimed': 0, 'last_sweep': None}
+
+    @classmethod
+    def pin(cls, path: str):
+        """Protect a recording (and its transcript) from sweeps while a job uses it."""
+        try:
+            with open(f"{os.path.splitext(path)[0]}{cls.PIN_SUFFIX}", 'w'):
+                pass
+        except OSError as e:
+            print(f"Error pinning {path}: {str(e)}")
+
+    @classmethod
+    def unpin(cls, path: str):
+        marker = f"{os.path.splitext(path)[0]}{cls.PIN_SUFFIX}"
+        try:
+            if os.path.exists(marker):
+                os.remove(marker)
+        except OSError as e:
+            print(f"Error unpinning {path}: {str(e)}")
+
+    @classmethod
+    def scan(cls, upload_folder: str) -> Tuple[List[dict], Dict[tuple, float]]:
+        """List the artifacts in the upload folder (and its partial/ folder) and the pin markers.
+
+        A partial upload's .json/.part pair is aged by whichever was written last,
+        so an upload that is still receiving chunks is not expired by its metadata.
+        """
+        partial_folder = os.path.join(upload_folder, 'partial')
+        artifacts = []
+        pins = {}
+        for folder in (upload_folder, partial_folder):
+            if not os.path.isdir(folder):
+                continue
+            for entry in os.scandir(folder):
+                if not entry.is_file():
+                    continue
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                stem, extension = os.path.splitext(entry.name)
+                if extension == cls.PIN_SUFFIX:
+                    pins[(folder, stem)] = stat.st_mtime
+                    continue
+                if folder == partial_folder:
+                    artifact_type = 'partial'
+                elif extension == '.txt':
+                    artifact_type = 'transcript'
+                else:
+                    artifact_type = 'audio'
+                artifacts.append({
+                    'path': entry.path,
+                    'key': (folder, stem),
+                    'type': artifact_type,
+                    'bytes': stat.st_size,
+                    'mtime': stat.st_mtime
+                })
+
+        latest = {}
+        for artifact in artifacts:
+            if artifact['type'] == 'partial':
+                latest[artifact['key']] = max(latest.get(artifact['key'], 0.0), artifact['mtime'])
+        for artifact in artifacts:
+            if artifact['type'] == 'partial':
+                artifact['mtime'] = latest[artifact['key']]
+        return artifacts, pins
+
+    @staticmethod
+    def _remove(path: str) -> bool:
+        try:
+            os.remove(path)
+            return True
+        except FileNotFoundError:
+            return False
+        except OSError as e:
+            print(f"Error removing {path}: {str(e)}")
+            return False
+
+    @classmethod
+    def sweep(cls, upload_folder: str, ttls: Dict[str, float], quota_bytes: int, pin_max_age: float) -> dict:
+        """Remove expired artifacts, then evict oldest-first until under quota.
+
+        Args:
+            upload_folder: The folder to sweep
+            ttls: Seconds to keep each artifact type ('audio', 'transcript', 'partial')
+            quota_bytes: Total size the folder may hold
+            pin_max_age: Seconds after which a pin is treated as left over from a crashed job
+        """
+        now = time.time()
+        artifacts, pins = cls.scan(upload_folder)
+        removed_files = 0
+        reclaimed = 0
+
+        pinned = set()
+        for (folder, stem), pinned_at in pins.items():
+            if now - pinned_at < pin_max_age:
+                pinned.add((folder, stem))
+            else:
+                cls._remove(os.path.join(folder, f"{stem}{cls.PIN_SUFFIX}"))
+
+        live = []
+        for artifact in artifacts:
+            ttl = ttls.get(artifact['type'])
+            if artifact['key'] not in pinned and ttl is not None and now - artifact['mtime'] > ttl:
+                if cls._remove(artifact['path']):
+                    removed_files += 1
+                    reclaimed += artifact['bytes']
+            else:
+                live.append(artifact)
+
+        # A partial upload's .json and .part are evicted together
+        units = {}
+        for artifact in live:
+            unit = artifact['key'] if artifact['type'] == 'partial' else artifact['path']
+            units.setdefault(unit, []).append(artifact)
+
+        total = sum(artifact['bytes'] for artifact in live)
+        for unit in sorted(units.values(), key=lambda group: group[0]['mtime']):
+            if total <= quota_bytes:
+                break
+            if unit[0]['key'] in pinned:
+                continue
+            for artifact in unit:
+                if cls._remove(artifact['path']):
+                    removed_files += 1
+                    reclaimed += artifact['bytes']
+                total -= artifact['bytes']
+
+        with cls._lock:
+            cls._stats['sweeps'] += 1
+            cls._stats['files_removed'] += removed_files
+            cls._stats['bytes_reclaimed'] += reclaimed
+            cls._stats['last_sweep'] = now
+
+        if removed_files:
+            print(f"Retention sweep removed {removed_files} files ({reclaimed / 1e6:.1f} MB)")
+        return {'files_removed': removed_files, 'bytes_reclaimed': reclaimed}
+
+    @classmethod
+    def sweep_with_config(cls, config):
+        return cls.sweep(
+            config['UPLOAD_FOLDER'],
+            {
+                'audio': config['RETENTION_AUDIO_TTL_HOURS'] * 3600,
+                'transcript': config['RETENTION_TRANSCRIPT_TTL_HOURS'] * 3600,
+                'partial': config['RETENTION_PARTIAL_TTL_HOURS'] * 3600
+            },
+            config['RETENTION_QUOTA_MB'] * 1024 * 1024,
+            config['RETENTION_PIN_MAX_AGE_HOURS'] * 3600
+        )
+
+    @classmethod
+    def start(cls, config):
+        """Start the background sweeper once per process (safe to call again after fork)."""
+        with cls._lock:
+            if cls._thread is not None and cls._thread_pid == os.getpid() and cls._thread.is_alive():
+                return
+            settings = {key: config[key] for key in (
+                'UPLOAD_FOLDER', 'RETENTION_AUDIO_TTL_HOURS', 'RETENTION_TRANSCRIPT_TTL_HOURS',
+                'RETENTION_PARTIAL_TTL_HOURS', 'RETENTION_QUOTA_MB', 'RETENTION_PIN_MAX_AGE_HOURS',
+                'RETENTION_SWEEP_INTERVAL'
+            )}
+
+            def run():
+                while True:
+                    try:
+                        cls.sweep_with_config(settings)
+                    except Exception as e:
+                        print(f"Retention sweep failed: {str(e)}")
+                    time.sleep(settings['RETENTION_SWEEP_INTERVAL'])
+
+            cls._thread = threading.Thread(target=run, name='retention-sweeper', daemon=True)
+            cls._thread_pid = os.getpid()
+            cls._thread.start()
+
+    @classmethod
+    def stats(cls, upload_folder: str) -> dict:
+        artifacts, pins = cls.scan(upload_folder)
+        held = {}
+        for artifact in artifacts:
+            entry = held.setdefault(artifact['type'], {'files': 0, 'bytes': 0})
+            entry['files'] += 1
+            entry['bytes'] += artifact['bytes']
+
+        with cls._lock:
+            return {
+                **cls._stats,
+                'held': held,
+                'files_held': len(artifacts),
+                'bytes_held': sum(artifact['bytes'] for artifact in artifacts),
+                'pinned': len(pins)
+            }
@@ -0,0 +1,186 @@
+import threading
+import wave
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+from app.services.transcription_service import TranscriptionService
+from app.services.note_generation_service import NoteGenerationService
+from app.services.retention_service import RetentionService
+
+class StreamingSession:
+    """Live transcription of a visit while it is happening.
+
+    The browser sends 16 kHz mono float32 PCM frames. Whisper runs on a rolling
+    window of not-yet-finalized audio; segments that end well before the edge of
+    the window are finalized, their audio is dropped from the window, and their
+    text is fed into ``NoteGenerationService.generate_note`` as an incremental
+    update so the draft note is nearly ready when the visit ends.
+    """
+
+    SAMPLE_RATE = 16000
+
+    def __init__(self, model: str, send: Callable[[dict], None], wav_path: Optional[str] = None,
+                 whisper_model: Optional[str] = None,
+                 step_seconds: float = 5.0, window_seconds: float = 30.0,
+                 holdback_seconds: float = 2.0, note_update_words: int = 150):
+        """
+        Args:
+            model: The LLM model to use for note generation
+            send: Callable used to push JSON-serializable updates to the client
+            wav_path: Optional path where the received audio is saved as 16-bit WAV
+            whisper_model: Whisper model size for transcription (defaults to Config)
+            step_seconds: Amount of new audio that triggers another transcription pass
+            window_seconds: Maximum length of the rolling window passed to Whisper
+            holdback_seconds: Segments ending within this margin of the window edge stay tentative
+            note_update_words: Finalized words to accumulate before updating the note
+        """
+        self.model = model
+        self.whisper_model = whisper_model
+        self.step_seconds = step_seconds
+        self.window_seconds = window_seconds
+        self.holdback_seconds = holdback_seconds
+        self.note_update_words = note_update_words
+
+        self._send = send
+        self._send_lock = threading.Lock()
+        self._lock = threading.Lock()
+        # A single worker serializes transcription passes and note updates
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='scribe-stream')
+        self._pending_pass = None
+
+        self._window = np.zeros(0, dtype=np.float32)
+        self._unprocessed_samples = 0
+        self._finalized_segments = []
+        self._note_backlog = []
+        self.note = None
+
+        self.wav_path = wav_path
+        self.recorded_samples = 0
+        self._wav = None
+        if wav_path:
+            RetentionService.pin(wav_path)
+            self._wav = wave.open(wav_path, 'wb')
+            self._wav.setnchannels(1)
+            self._wav.setsampwidth(2)
+            self._wav.setframerate(self.SAMPLE_RATE)
+
+    @property
+    def transcript(self) -> str:
+        return ' '.join(self._finalized_segments).strip()
+
+    def add_audio(self, data: bytes):
+        """Append a frame of float32 PCM and schedule a transcription pass when enough is buffered."""
+        frames = np.frombuffer(data, dtype=np.float32)
+        if frames.size == 0:
+            return
+
+        if self._wav is not None:
+            pcm = (np.clip(frames, -1.0, 1.0) * 32767).astype('<i2')
+            self._wav.writeframes(pcm.tobytes())
+            self.recorded_samples += frames.size
+
+        with self._lock:
+            self._window = np.concatenate([self._window, frames])
+            self._unprocessed_samples += frames.size
+            ready = self._unprocessed_samples >= self.step_seconds * self.SAMPLE_RATE
+            busy = self._pending_pass is not None and not self._pending_pass.done()
+            if ready and not busy:
+                self._unprocessed_samples = 0
+                self._pending_pass = self._executor.submit(self._guarded, self._transcribe_window, False)
+
+    def finish(self) -> dict:
+        """Transcribe the remaining audio, finalize the note and return the results."""
+        try:
+            self._executor.submit(self._transcribe_window, True).result()
+            return self._executor.submit(self._finalize_note).result()
+        finally:
+            self.close()
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+        if self._wav is not None:
+            self._wav.close()
+            self._wav = None
+            RetentionService.unpin(self.wav_path)
+
+    def _emit(self, message: dict):
+        try:
+            with self._send_lock:
+                self._send(message)
+        except Exception as e:
+            print(f"Error sending streaming update: {str(e)}")
+
+    def _guarded(self, func, *args):
+        try:
+            return func(*args)
+        except Exception as e:
+            print(f"Streaming pass failed: {str(e)}")
+            self._emit({'type': 'error', 'error': str(e)})
+
+    def _transcribe_window(self, final: bool):
+        with self._lock:
+            window = self._window.copy()
+        if window.size == 0:
+            return
+
+        window_end = window.size / self.SAMPLE_RATE
+        segments = TranscriptionService.transcribe_buffer(window, self.whisper_model)['segments']
+
+        if final:
+            finalize_until = window_end
+        else:
+            finalize_until = window_end - self.holdback_seconds
+            # Never let the window grow past what Whisper handles in one pass:
+            # keep at most the last segment tentative
+            if window_end >= self.window_seconds and segments:
+                last = segments[-2]['end'] if len(segments) > 1 else segments[-1]['end']
+                finalize_until = max(finalize_until, last)
+
+        finalized = [s for s in segments if s['end'] <= finalize_until]
+        tentative = [s for s in segments if s['end'] > finalize_until]
+
+        if finalized:
+            cut = window.size if final else int(finalized[-1]['end'] * self.SAMPLE_RATE)
+            with self._lock:
+                self._window = self._window[cut:]
+            texts = [s['text'].strip() for s in finalized if s['text'].strip()]
+            self._finalized_segments.extend(texts)
+            self._note_backlog.extend(texts)
+        elif not final and window_end >= self.window_seconds:
+            # Nothing recognisable in a full window (e.g. silence); drop it
+            with self._lock:
+                self._window = self._window[window.size:]
+
+        self._emit({
+            'type': 'transcript',
+            'transcript': self.transcript,
+            'partial': ' '.join(s['text'].strip() for s in tentative).strip()
+        })
+
+        if not final and self._backlog_words() >= self.note_update_words:
+            self._update_note(is_complete=False)
+
+    def _backlog_words(self) -> int:
+        return len(' '.join(self._note_backlog).split())
+
+    def _update_note(self, is_complete: bool):
+        text = ' '.join(self._note_backlog).strip()
+        self._note_backlog = []
+        if not text:
+            return
+
+        self.note = NoteGenerationService.generate_note(
+            transcript=text,
+            model=self.model,
+            previous_note=self.note,
+            is_complete=is_complete
+        )
+        self._emit({'type': 'note', 'note': self.note, 'final': False})
+
+    def _finalize_note(self) -> dict:
+        if self._note_backlog or self.note is None:
+            self._update_note(is_complete=True)
+
+        note = NoteGenerationService.clean_note(self.note, self.model) if self.note else ''
+        self.note = note
+        return {'transcript': self.transcript, 'note': note}
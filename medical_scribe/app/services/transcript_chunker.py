@@ -0,0 +1,137 @@
+import re
+import threading
+from typing import Dict, List
+
+class TranscriptChunker:
+    """Token-aware transcript splitter.
+
+    Tokens are counted with the tokenizer named by ``spec``:
+
+    - ``tiktoken:<encoding>`` (e.g. ``tiktoken:cl100k_base``)
+    - ``hf:<repo or tokenizer.json path>`` via the ``tokenizers`` package
+    - ``chars:<n>`` a rough estimate of one token per n characters
+
+    If the requested tokenizer cannot be loaded the chunker falls back to a
+    conservative character estimate. Chunks are cut at sentence and speaker-turn
+    boundaries and packed up to the token budget.
+    """
+
+    # Split after sentence-ending punctuation, at newlines, and before speaker labels
+    BOUNDARY_PATTERN = re.compile(
+        r'(?<=[.!?])\s+|\n+|\s+(?=(?:Doctor|Patient|Dr\.|Nurse|Speaker \d+)\s*:)'
+    )
+    FALLBACK_CHARS_PER_TOKEN = 3
+
+    _instances: Dict[str, 'TranscriptChunker'] = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, spec: str):
+        self.spec = spec
+        self._encode = None
+        self._chars_per_token = self.FALLBACK_CHARS_PER_TOKEN
+
+        kind, _, name = spec.partition(':')
+        try:
+            if kind == 'tiktoken':
+                import tiktoken
+                encoding = tiktoken.get_encoding(name)
+                self._encode = lambda text: encoding.encode(text, disallowed_special=())
+            elif kind == 'hf':
+                from tokenizers import Tokenizer
+                if name.endswith('.json'):
+                    tokenizer = Tokenizer.from_file(name)
+                else:
+                    tokenizer = Tokenizer.from_pretrained(name)
+                self._encode = lambda text: tokenizer.encode(text, add_special_tokens=False).ids
+            elif kind == 'chars':
+                self._chars_per_token = float(name)
+            else:
+                raise ValueError(f"Unknown tokenizer spec '{spec}'")
+        except Exception as e:
+            print(f"Tokenizer '{spec}' unavailable, estimating tokens from characters: {str(e)}")
+            self._encode = None
+
+    @classmethod
+    def get(cls, spec: str) -> 'TranscriptChunker':
+        with cls._instances_lock:
+            if spec not in cls._instances:
+                cls._instances[spec] = cls(spec)
+            return cls._instances[spec]
+
+    def count_tokens(self, text: str) -> int:
+        if not text:
+            return 0
+        if self._encode is not None:
+            return len(self._encode(text))
+        return int(len(text) / self._chars_per_token) + 1
+
+    def split_units(self, transcript: str) -> List[str]:
+        """Split a transcript into sentences and speaker turns."""
+        return [unit.strip() for unit in self.BOUNDARY_PATTERN.split(transcript) if unit and unit.strip()]
+
+    def _split_long_unit(self, unit: str, max_tokens: int) -> List[str]:
+        """Split a single over-long sentence at word boundaries."""
+        pieces = []
+        current = []
+        for word in unit.split():
+            candidate = ' '.join(current + [word])
+            if current and self.count_tokens(candidate) > max_tokens:
+                pieces.append(' '.join(current))
+                current = [word]
+            else:
+                current.append(word)
+        if current:
+            pieces.append(' '.join(current))
+        return pieces
+
+    def chunk(self, transcript: str, max_tokens: int, overlap_tokens: int = 0) -> List[str]:
+        """Pack sentences into chunks of at most ``max_tokens`` tokens.
+
+        Args:
+            transcript: The transcript text
+            max_tokens: Token budget per chunk
+            overlap_tokens: Repeat up to this many tokens of trailing sentences at the
+                start of the next chunk so context is not lost at the cut
+        """
+        max_tokens = max(1, max_tokens)
+        overlap_tokens = max(0, min(overlap_tokens, max_tokens // 2))
+
+        units = []
+        for unit in self.split_units(transcript):
+            tokens = self.count_tokens(unit)
+            if tokens > max_tokens:
+                units.extend((piece, self.count_tokens(piece)) for piece in self._split_long_unit(unit, max_tokens))
+            else:
+                units.append((unit, tokens))
+
+        chunks = []
+        current = []
+        current_tokens = 0
+        new_units = 0
+        for unit, tokens in units:
+            # +1 for the joining space
+            if current and current_tokens + tokens + 1 > max_tokens:
+                chunks.append(' '.join(text for text, _ in current))
+
+                carried = []
+                carried_tokens = 0
+                for text, count in reversed(current):
+                    if carried_tokens + count + 1 > overlap_tokens:
+                        break
+                    carried.insert(0, (text, count))
+                    carried_tokens += count + 1
+                # Drop overlap rather than overflow the budget
+                while carried and carried_tokens + tokens + 1 > max_tokens:
+                    carried_tokens -= carried.pop(0)[1] + 1
+                current = carried
+                current_tokens = carried_tokens
+                new_units = 0
+
+            current.append((unit, tokens))
+            current_tokens += tokens + 1
+            new_units += 1
+
+        if current and new_units:
+            chunks.append(' '.join(text for text, _ in current))
+
+        return chunks
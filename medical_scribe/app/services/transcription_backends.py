@@ -0,0 +1,176 @@
+from abc import ABC, abstractmethod
+from types import SimpleNamespace
+from typing import Iterator
+import numpy as np
+import torch
+import whisper
+from config import Config
+
+class TranscriptionBackend(ABC):
+    """Interface between TranscriptionService and a speech-to-text engine.
+
+    ``load`` returns an opaque model object that TranscriptionService keeps in
+    its warm pool; the other methods receive it back. Results use Whisper's
+    shape: {'text', 'segments': [{'start', 'end', 'text', ...}], 'language'},
+    with times in seconds from the start of the buffer.
+    """
+
+    name = None
+
+    def resolve_precision(self, device: str, precision: str) -> str:
+        """The precision actually used on ``device`` for a requested one."""
+        return precision
+
+    @abstractmethod
+    def load(self, model_size: str, device: str, precision: str):
+        """Load the model for ``model_size`` on ``device`` at ``precision``."""
+
+    def model_bytes(self, model) -> int:
+        return 0
+
+    def decode_options(self, precision: str) -> dict:
+        """Decoding settings that change the output; part of the transcript cache key."""
+        return {}
+
+    @abstractmethod
+    def transcribe_buffer(self, model, audio: np.ndarray, precision: str) -> dict:
+        """Transcribe a 16 kHz mono float32 buffer into a Whisper-style result."""
+
+    def stream_segments(self, model, audio: np.ndarray, precision: str) -> Iterator[dict]:
+        """Yield segments as they are decoded (engines that cannot stream yield them at the end)."""
+        yield from self.transcribe_buffer(model, audio, precision)['segments']
+
+class WhisperBackend(TranscriptionBackend):
+    """openai-whisper on PyTorch; int8 uses dynamic quantization of the linear layers on CPU."""
+
+    name = 'whisper'
+
+    def resolve_precision(self, device, precision):
+        if precision == 'fp16' and device == 'cpu':
+            # Half precision is not supported for Whisper decoding on CPU
+            return 'fp32'
+        if precision == 'int8' and device != 'cpu':
+            # Dynamic quantization only runs on CPU; half precision is the GPU equivalent
+            return 'fp16'
+        return precision
+
+    @staticmethod
+    def quantize_int8(model):
+        """Dynamically quantize the model's linear layers to int8 (CPU only)."""
+        # whisper.model.Linear only casts its weights to the input dtype, a no-op
+        # in fp32, and quantize_dynamic only converts exact nn.Linear modules
+        for module in model.modules():
+            if isinstance(module, torch.nn.Linear):
+                module.__class__ = torch.nn.Linear
+        return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+
+    def load(self, model_size, device, precision):
+        model = whisper.load_model(model_size, device=device)
+        model.eval()
+        if precision == 'int8':
+            model = self.quantize_int8(model)
+        return model
+
+    def model_bytes(self, model):
+        # state_dict also covers the packed weights of quantized layers
+        total = 0
+        for value in model.state_dict().values():
+            for tensor in (value if isinstance(value, tuple) else (value,)):
+                if isinstance(tensor, torch.Tensor):
+                    total += tensor.numel() * tensor.element_size()
+        return total
+
+    def decode_options(self, precision):
+        return {'fp16': precision == 'fp16'}
+
+    def transcribe_buffer(self, model, audio, precision):
+        with torch.no_grad():
+            return model.transcribe(audio, **self.decode_options(precision))
+
+class FasterWhisperBackend(TranscriptionBackend):
+    """faster-whisper (CTranslate2): int8 weights, beam search and batched decoding
+    of 30 s windows, typically several times faster than openai-whisper on CPU.
+
+    Needs the optional ``faster-whisper`` package.
+    """
+
+    name = 'faster-whisper'
+
+    COMPUTE_TYPES = {
+        ('cpu', 'fp32'): 'float32',
+        ('cpu', 'int8'): 'int8',
+        ('cuda', 'fp32'): 'float32',
+        ('cuda', 'fp16'): 'float16',
+        ('cuda', 'int8'): 'int8_float16'
+    }
+    # Approximate parameter counts, for the warm pool's memory budget
+    PARAMETERS = {'tiny': 39e6, 'base': 74e6, 'small': 244e6, 'medium': 769e6, 'large': 1550e6, 'turbo': 809e6}
+    BYTES_PER_WEIGHT = {'fp32': 4, 'fp16': 2, 'int8': 1}
+
+    def resolve_precision(self, device, precision):
+        if precision == 'fp16' and device == 'cpu':
+            return 'fp32'
+        return precision
+
+    def load(self, model_size, device, precision):
+        try:
+            from faster_whisper import BatchedInferencePipeline, WhisperModel
+        except ImportError:
+            raise Exception("The faster-whisper backend needs the faster-whisper package (pip install faster-whisper)")
+
+        # Follow the torch intra-op setting, which the production server splits across workers
+        model = WhisperModel(
+            model_size,
+            device=device,
+            compute_type=self.COMPUTE_TYPES[(device, precision)],
+            cpu_threads=torch.get_num_threads(),
+            num_workers=Config.FASTER_WHISPER_NUM_WORKERS
+        )
+        pipeline = BatchedInferencePipeline(model=model) if Config.FASTER_WHISPER_BATCH_SIZE > 1 else None
+        return SimpleNamespace(model=model, pipeline=pipeline, size=model_size, precision=precision)
+
+    def model_bytes(self, model):
+        size = model.size.split('.')[0].split('-')[0]
+        return int(self.PARAMETERS.get(size, 0) * self.BYTES_PER_WEIGHT[model.precision])
+
+    def decode_options(self, precision):
+        return {'beam_size': Config.WHISPER_BEAM_SIZE, 'batch_size': Config.FASTER_WHISPER_BATCH_SIZE}
+
+    def _transcribe(self, model, audio):
+        if model.pipeline is not None:
+            return model.pipeline.transcribe(
+                audio, beam_size=Config.WHISPER_BEAM_SIZE, batch_size=Config.FASTER_WHISPER_BATCH_SIZE
+            )
+        return model.model.transcribe(audio, beam_size=Config.WHISPER_BEAM_SIZE)
+
+    @staticmethod
+    def _segment(segment) -> dict:
+        return {
+            'id': segment.id,
+            'start': segment.start,
+            'end': segment.end,
+            'text': segment.text,
+            'avg_logprob': segment.avg_logprob,
+            'no_speech_prob': segment.no_speech_prob
+        }
+
+    def stream_segments(self, model, audio, precision):
+        segments, _ = self._transcribe(model, audio)
+        for segment in segments:
+            yield self._segment(segment)
+
+    def transcribe_buffer(self, model, audio, precision):
+        segments, info = self._transcribe(model, audio)
+        segments = [self._segment(segment) for segment in segments]
+        return {
+            'text': ''.join(segment['text'] for segment in segments),
+            'segments': segments,
+            'language': info.language
+        }
+
+BACKENDS = {backend.name: backend for backend in (WhisperBackend(), FasterWhisperBackend())}
+
+def get_backend(name: str) -> TranscriptionBackend:
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown transcription backend '{name}'. Choose one of: {', '.join(BACKENDS)}")
+    return BACKENDS[name]
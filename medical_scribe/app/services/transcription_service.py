@@ -1,40 +1,313 @@
 import whisper
+from whisper.audio import SAMPLE_RATE
 import torch
 import numpy as np
+import soundfile as sf
 import os
+import threading
+import time
+from config import Config
+from app.services.model_registry import ModelRegistry
+from app.services.cache_service import DiskCache
+from app.services.metrics_service import MetricsService
+from app.services.vad_service import VadService
+from app.services.transcription_backends import get_backend
 
 class TranscriptionService:
-    _model = None
+    PRECISIONS = ('fp32', 'fp16', 'int8')
+    
+    _registry = None
+    _transcript_cache = None
+    _registry_lock = threading.Lock()
+    
+    @staticmethod
+    def resolve_model_key(model_size=None, device=None, precision=None, backend=None):
+        """Fill unset options from Config and validate them; returns (size, device, precision, backend)."""
+        model_size = model_size or Config.WHISPER_MODEL
+        if model_size not in Config.WHISPER_ALLOWED_MODELS:
+            raise ValueError(
+                f"Unknown Whisper model '{model_size}'. "
+                f"Choose one of: {', '.join(Config.WHISPER_ALLOWED_MODELS)}"
+            )
+        
+        device = device or Config.WHISPER_DEVICE
+        if device == 'auto':
+            device = 'cuda' if torch.cuda.is_available() else 'cpu'
+        
+        precision = precision or Config.WHISPER_PRECISION
+        if precision not in TranscriptionService.PRECISIONS:
+            raise ValueError(
+                f"Unknown Whisper precision '{precision}'. "
+                f"Choose one of: {', '.join(TranscriptionService.PRECISIONS)}"
+            )
+        
+        backend = backend or Config.TRANSCRIPTION_BACKEND
+        precision = get_backend(backend).resolve_precision(device, precision)
+        
+        return model_size, device, precision, backend
+    
+    @staticmethod
+    def configure_threads(intra_op=None, inter_op=None):
+        """Apply torch intra-op/inter-op thread counts (defaults from Config; 0 keeps torch's default)."""
+        intra_op = intra_op or Config.WHISPER_INTRA_OP_THREADS
+        inter_op = inter_op or Config.WHISPER_INTER_OP_THREADS
+        if intra_op:
+            torch.set_num_threads(intra_op)
+        if inter_op:
+            try:
+                torch.set_num_interop_threads(inter_op)
+            except RuntimeError as e:
+                # Only allowed before the first inter-op parallel work in the process
+                print(f"Could not set inter-op threads: {str(e)}")
+    
+    @staticmethod
+    def _load_model(model_size, device, precision, backend):
+        return get_backend(backend).load(model_size, device, precision)
+    
+    @staticmethod
+    def _model_bytes(model, key):
+        return get_backend(key[3]).model_bytes(model)
+    
+    @classmethod
+    def get_registry(cls):
+        with cls._registry_lock:
+            if cls._registry is None:
+                cls.configure_threads()
+                cls._registry = ModelRegistry(
+                    loader=cls._load_model,
+                    max_models=Config.WHISPER_MAX_MODELS,
+                    memory_budget_bytes=Config.WHISPER_MEMORY_BUDGET_MB * 1024 * 1024,
+                    sizer=cls._model_bytes,
+                    on_event=cls._record_model_event
+                )
+            return cls._registry
+    
+    @staticmethod
+    def _record_model_event(event, key, seconds):
+        if event == 'load':
+            MetricsService.MODEL_LOADS.labels(key[0]).inc()
+            MetricsService.MODEL_LOAD_SECONDS.labels(key[0]).observe(seconds)
+        elif event == 'evict':
+            MetricsService.MODEL_EVICTIONS.labels(key[0]).inc()
+    
+    @classmethod
+    def get_model(cls, model_size=None, device=None, precision=None, backend=None):
+        key = cls.resolve_model_key(model_size, device, precision, backend)
+        return cls.get_registry().get(key)
+    
+    @staticmethod
+    def decode_options(key):
+        """The backend's decoding options for a resolved model key; part of the cache key."""
+        return get_backend(key[3]).decode_options(key[2])
+    
+    @staticmethod
+    def vad_options():
+        """VadService.trim settings, or None when VAD is off; part of the cache key when set."""
+        if not Config.VAD_ENABLED:
+            return None
+        return {
+            'frame_ms': Config.VAD_FRAME_MS,
+            'threshold_db': Config.VAD_THRESHOLD_DB,
+            'min_energy_db': Config.VAD_MIN_ENERGY_DB,
+            'min_silence_s': Config.VAD_MIN_SILENCE_SECONDS,
+            'pad_s': Config.VAD_PAD_SECONDS,
+            'min_keep_ratio': Config.VAD_MIN_KEEP_RATIO
+        }
+    
+    @staticmethod
+    def parallel_options():
+        """Chunking settings of the long-audio mode; part of the cache key when it is enabled."""
+        return {
+            'min_s': Config.PARALLEL_TRANSCRIBE_MIN_SECONDS,
+            'chunk_s': Config.PARALLEL_TRANSCRIBE_CHUNK_SECONDS,
+            'overlap_s': Config.PARALLEL_TRANSCRIBE_OVERLAP_SECONDS,
+            'min_gap_s': Config.PARALLEL_TRANSCRIBE_MIN_GAP_SECONDS
+        }
+    
+    @classmethod
+    def get_transcript_cache(cls):
+        with cls._registry_lock:
+            if cls._transcript_cache is None:
+                cls._transcript_cache = DiskCache(
+                    Config.TRANSCRIPT_CACHE_DIR,
+                    Config.TRANSCRIPT_CACHE_MAX_MB * 1024 * 1024
+                )
+            return cls._transcript_cache
+    
+    @classmethod
+    def _prepare_audio(cls, audio):
+        """Trim silences when VAD is enabled; returns (audio, timestamp map or None, vad stats or None)."""
+        audio = np.asarray(audio, dtype=np.float32)
+        vad_options = cls.vad_options()
+        if vad_options is None:
+            return audio, None, None
+        
+        vad_started = time.perf_counter()
+        audio_s = audio.size / SAMPLE_RATE
+        audio, timestamp_map = VadService.trim(audio, SAMPLE_RATE, **vad_options)
+        vad_stats = {
+            'vad_s': time.perf_counter() - vad_started,
+            'speech_s': timestamp_map.trimmed_duration,
+            'skipped_s': max(0.0, audio_s - timestamp_map.trimmed_duration)
+        }
+        return audio, timestamp_map, vad_stats
     
     @classmethod
-    def get_model(cls):
-        if cls._model is None:
-            cls._model = whisper.load_model("base")
-            cls._model.eval()
-        return cls._model
+    def _run_model(cls, audio, model_size=None, precision=None, backend=None):
+        """Run the transcription backend on a buffer, trimming silences first when VAD is enabled.
+        
+        Segment times in the result always refer to the untrimmed buffer; with VAD
+        the result also carries a 'vad' dict (vad_s, speech_s, skipped_s).
+        """
+        key = cls.resolve_model_key(model_size, precision=precision, backend=backend)
+        audio, timestamp_map, vad_stats = cls._prepare_audio(audio)
+        if timestamp_map is not None and audio.size == 0:
+            return {'text': '', 'segments': [], 'language': None, 'vad': vad_stats}
+        
+        model = cls.get_registry().get(key)
+        result = get_backend(key[3]).transcribe_buffer(model, audio, key[2])
+        
+        if timestamp_map is not None:
+            timestamp_map.remap_result(result)
+            result['vad'] = vad_stats
+        return result
     
     @classmethod
-    def transcribe_audio(cls, audio_file_path, save_to_file=False):
+    def transcribe_buffer(cls, audio, model_size=None, precision=None, backend=None):
+        """Transcribe a 16 kHz mono float32 buffer and return Whisper's result dict (text and segments)."""
         try:
-            with torch.no_grad():
-                model = cls.get_model()
-                
-                audio = whisper.load_audio(audio_file_path)
-                audio = whisper.pad_or_trim(audio)
-                mel = whisper.log_mel_spectrogram(audio)
+            return cls._run_model(audio, model_size, precision, backend)
+        except Exception as e:
+            raise Exception(f"Transcription failed: {str(e)}")
+    
+    @classmethod
+    def stream_segments(cls, audio, model_size=None, precision=None, backend=None):
+        """Yield transcript segments of a 16 kHz mono float32 buffer as the backend decodes them.
+        
+        Segment times refer to the untrimmed buffer, as with transcribe_buffer.
+        """
+        try:
+            key = cls.resolve_model_key(model_size, precision=precision, backend=backend)
+            audio, timestamp_map, _ = cls._prepare_audio(audio)
+            if audio.size == 0:
+                return
+            
+            model = cls.get_registry().get(key)
+            for segment in get_backend(key[3]).stream_segments(model, audio, key[2]):
+                if timestamp_map is not None:
+                    segment = timestamp_map.remap_result({'segments': [segment]})['segments'][0]
+                yield segment
+        except Exception as e:
+            raise Exception(f"Transcription failed: {str(e)}")
+    
+    @staticmethod
+    def load_audio_buffer(audio_file_path):
+        """Decode an audio file once to a 16 kHz mono float32 buffer.
+        
+        Canonical uploads (16 kHz mono FLAC/WAV) are read in-process with
+        soundfile; anything else goes through a single ffmpeg process.
+        """
+        try:
+            info = sf.info(audio_file_path)
+            if info.samplerate == SAMPLE_RATE and info.channels == 1:
+                audio, _ = sf.read(audio_file_path, dtype='float32')
+                return audio
+        except Exception:
+            pass
+        return whisper.load_audio(audio_file_path)
+    
+    @classmethod
+    def transcribe_audio(cls, audio_file_path, save_to_file=False, return_timings=False, model_size=None,
+                         audio_hash=None):
+        """Transcribe an audio file, decoding it at most once.
+        
+        The transcript cache is checked first, keyed on the audio content hash,
+        the Whisper model and the decoding options, so re-uploads and batch
+        re-runs of the same recording skip decoding and inference entirely.
+        With VAD enabled only speech is sent to Whisper; the timings then include
+        vad_s, speech_s and skipped_s (audio seconds not transcribed). Recordings
+        longer than PARALLEL_TRANSCRIBE_MIN_SECONDS go through LongAudioService
+        when it is enabled, adding chunks and workers to the timings.
+        
+        Args:
+            audio_file_path: Path of the recording
+            save_to_file: Write the transcript next to the recording as .txt
+            return_timings: Also return per-stage timings (seconds) as a dict
+            model_size: Whisper model size (defaults to Config.WHISPER_MODEL)
+            audio_hash: Content hash to key the cache on instead of hashing the file;
+                pass the original upload's hash when transcribing a transcoded copy
+            
+        Returns:
+            str, or (str, dict) when return_timings is set
+        """
+        try:
+            timings = {'cache_hit': False}
+            started = time.perf_counter()
+            key = cls.resolve_model_key(model_size)
+            
+            cache_key = None
+            cached = None
+            if Config.TRANSCRIPT_CACHE_ENABLED:
+                audio_hash = audio_hash or DiskCache.hash_file(audio_file_path)
+                key_parts = ['transcript', audio_hash, key[0], key[2], cls.decode_options(key)]
+                if key[3] != 'whisper':
+                    # Keeps transcripts cached before backends were pluggable valid
+                    key_parts.append(key[3])
+                if cls.vad_options() is not None:
+                    key_parts.append(cls.vad_options())
+                if Config.PARALLEL_TRANSCRIBE_ENABLED:
+                    key_parts.append(cls.parallel_options())
+                cache_key = DiskCache.make_key(*key_parts)
+                cached = cls.get_transcript_cache().get(cache_key)
+                timings['hash_s'] = time.perf_counter() - started
+            
+            if cached is not None:
+                transcribed_text = cached['text']
+                timings['cache_hit'] = True
+                timings['audio_s'] = cached['audio_s']
+                timings['inference_s'] = 0.0
+            else:
+                decode_started = time.perf_counter()
+                audio = cls.load_audio_buffer(audio_file_path)
+                timings['decode_s'] = time.perf_counter() - decode_started
+                timings['audio_s'] = len(audio) / SAMPLE_RATE
                 
-                result = model.transcribe(
-                    audio_file_path,
-                    fp16=False
-                )
+                inference_started = time.perf_counter()
+                from app.services.long_audio_service import LongAudioService
+                if LongAudioService.should_parallelize(audio, key):
+                    result = LongAudioService.transcribe(audio, model_size)
+                    timings.update(result['parallel'])
+                else:
+                    result = cls._run_model(audio, model_size)
+                timings['inference_s'] = time.perf_counter() - inference_started
+                if 'vad' in result:
+                    timings.update(result['vad'])
+                    print(f"VAD skipped {timings['skipped_s']:.1f}s of {timings['audio_s']:.1f}s audio")
                 
                 transcribed_text = result["text"]
+                if cache_key is not None:
+                    cls.get_transcript_cache().set(cache_key, {
+                        'text': transcribed_text,
+                        'audio_s': timings['audio_s'],
+                        'model': key[0],
+                        'precision': key[2],
+                        'backend': key[3]
+                    })
+            
+            if save_to_file:
                 base_name = os.path.splitext(audio_file_path)[0]
                 output_file_path = f"{base_name}.txt"
-                if save_to_file:
-                    with open(output_file_path, 'w', encoding='utf-8') as f:
-                        f.write(transcribed_text)
-                
-                return transcribed_text
+                with open(output_file_path, 'w', encoding='utf-8') as f:
+                    f.write(transcribed_text)
+            
+            timings['total_s'] = time.perf_counter() - started
+            timings['real_time_factor'] = (
+                timings['inference_s'] / timings['audio_s'] if timings['audio_s'] else None
+            )
+            MetricsService.observe_transcription(key[0], timings)
+            
+            if return_timings:
+                return transcribed_text, timings
+            return transcribed_text
         except Exception as e:
-            raise Exception(f"Transcription failed: {str(e)}") 
\ No newline at end of file
+            raise Exception(f"Transcription failed: {str(e)}")
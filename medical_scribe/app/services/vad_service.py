@@ -0,0 +1,120 @@
+import bisect
+from typing import List, Tuple
+import numpy as np
+
+class TimestampMap:
+    """Maps times in trimmed (speech-only) audio back to the original recording.
+
+    ``spans`` are the kept (start, end) ranges of the original audio in seconds,
+    in order; the trimmed audio is their concatenation.
+    """
+
+    def __init__(self, spans: List[Tuple[float, float]]):
+        self.spans = spans
+        self._trimmed_starts = []
+        position = 0.0
+        for start, end in spans:
+            self._trimmed_starts.append(position)
+            position += end - start
+        self.trimmed_duration = position
+
+    def to_original(self, t: float) -> float:
+        if not self.spans:
+            return t
+        i = max(0, bisect.bisect_right(self._trimmed_starts, t) - 1)
+        start, end = self.spans[i]
+        return min(start + (t - self._trimmed_starts[i]), end)
+
+    def remap_result(self, result: dict) -> dict:
+        """Rewrite segment (and word) times of a Whisper result in place."""
+        for segment in result.get('segments', []):
+            segment['start'] = self.to_original(segment['start'])
+            segment['end'] = self.to_original(segment['end'])
+            for word in segment.get('words', []) or []:
+                word['start'] = self.to_original(word['start'])
+                word['end'] = self.to_original(word['end'])
+        return result
+
+class VadService:
+    """Energy-based voice activity detection for dropping long silences before Whisper.
+
+    Frames louder than the recording's noise floor by ``threshold_db`` (and above
+    ``min_energy_db`` dBFS) count as speech. Speech spans are padded, and only
+    silences longer than ``min_silence_s`` are removed, so pauses inside a
+    conversation stay intact and Whisper keeps its context.
+    """
+
+    @staticmethod
+    def frame_energies(audio: np.ndarray, frame_samples: int) -> np.ndarray:
+        """Per-frame RMS energy in dBFS."""
+        frames = len(audio) // frame_samples
+        if frames == 0:
+            return np.zeros(0, dtype=np.float32)
+        framed = audio[:frames * frame_samples].reshape(frames, frame_samples).astype(np.float32)
+        rms = np.sqrt(np.mean(framed ** 2, axis=1))
+        return 20 * np.log10(np.maximum(rms, 1e-10))
+
+    @staticmethod
+    def detect_speech(audio: np.ndarray, sample_rate: int, frame_ms: int = 30, threshold_db: float = 12.0,
+                      min_energy_db: float = -55.0, min_silence_s: float = 1.0,
+                      pad_s: float = 0.25) -> List[Tuple[float, float]]:
+        """Return the (start, end) seconds of audio to keep."""
+        duration = len(audio) / sample_rate
+        frame_samples = max(1, int(sample_rate * frame_ms / 1000))
+        energies = VadService.frame_energies(audio, frame_samples)
+        if energies.size == 0:
+            return [(0.0, duration)] if duration else []
+
+        if not (energies > min_energy_db).any():
+            return []
+
+        # When the quietest frames are barely quieter than the loud ones (steady
+        # background noise, no pauses) the floor sits at the speech level: keep it all
+        noise_floor = np.percentile(energies, 10)
+        if np.percentile(energies, 95) - noise_floor < threshold_db:
+            return [(0.0, duration)]
+        speech = energies > max(noise_floor + threshold_db, min_energy_db)
+
+        frame_s = frame_samples / sample_rate
+        spans = []
+        start = None
+        for i, is_speech in enumerate(speech):
+            if is_speech and start is None:
+                start = i
+            elif not is_speech and start is not None:
+                spans.append((start * frame_s, i * frame_s))
+                start = None
+        if start is not None:
+            spans.append((start * frame_s, duration))
+
+        # Pad, then merge across silences too short to be worth removing
+        merged = []
+        for start, end in spans:
+            start, end = max(0.0, start - pad_s), min(duration, end + pad_s)
+            if merged and start - merged[-1][1] < min_silence_s:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+            else:
+                merged.append((start, end))
+        return merged
+
+    @staticmethod
+    def trim(audio: np.ndarray, sample_rate: int, min_keep_ratio: float = 0.0,
+             **options) -> Tuple[np.ndarray, TimestampMap]:
+        """Drop non-speech spans; returns the speech-only audio and its timestamp map.
+
+        Audio that is not silent is returned untrimmed when detection keeps less
+        than ``min_keep_ratio`` of it, which is more likely a misjudged noise floor
+        than a recording that is almost all silence.
+        """
+        spans = VadService.detect_speech(audio, sample_rate, **options)
+        duration = len(audio) / sample_rate
+        kept = sum(end - start for start, end in spans)
+        if duration and kept < min_keep_ratio * duration:
+            min_energy_db = options.get('min_energy_db', -55.0)
+            if np.sqrt(np.mean(np.square(audio, dtype=np.float32))) > 10 ** (min_energy_db / 20):
+                print(f"VAD kept {kept:.1f}s of {duration:.1f}s of audio; transcribing it untrimmed")
+                spans = [(0.0, duration)]
+
+        pieces = [audio[int(start * sample_rate):int(end * sample_rate)] for start, end in spans]
+        trimmed = np.concatenate(pieces) if pieces else np.zeros(0, dtype=audio.dtype)
+        return trimmed, TimestampMap(spans)
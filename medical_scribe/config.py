@@ -4,4 +4,124 @@ from dotenv import load_dotenv
 load_dotenv()
 
 class Config:
-    UPLOAD_FOLDER = os.path.abspath(os.path.join(os.path.dirname(__file__), 'uploads'))
\ No newline at end of file
+    UPLOAD_FOLDER = os.path.abspath(os.path.join(os.path.dirname(__file__), 'uploads'))
+
+    # Production server (python run.py --production)
+    SERVER_BIND = os.environ.get('SERVER_BIND', '0.0.0.0:8000')
+    SERVER_WORKERS = int(os.environ.get('SERVER_WORKERS', 2))
+    SERVER_THREADS = int(os.environ.get('SERVER_THREADS', 8))  # also bounds open WebSocket streams per worker
+    SERVER_TIMEOUT = int(os.environ.get('SERVER_TIMEOUT', 120))
+    SERVER_PRELOAD_WHISPER = os.environ.get('SERVER_PRELOAD_WHISPER', '1') == '1'
+
+    # Background job queue for /process-audio
+    JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 2))
+    JOB_RESULT_TTL = int(os.environ.get('JOB_RESULT_TTL', 60 * 60))
+    JOB_STATE_DIR = os.environ.get('JOB_STATE_DIR', os.path.join(UPLOAD_FOLDER, 'jobs'))  # shared by server workers
+
+    # Live streaming transcription over WebSocket
+    STREAM_STEP_SECONDS = float(os.environ.get('STREAM_STEP_SECONDS', 5))
+    STREAM_WINDOW_SECONDS = float(os.environ.get('STREAM_WINDOW_SECONDS', 30))
+    STREAM_HOLDBACK_SECONDS = float(os.environ.get('STREAM_HOLDBACK_SECONDS', 2))
+    STREAM_NOTE_UPDATE_WORDS = int(os.environ.get('STREAM_NOTE_UPDATE_WORDS', 150))
+
+    # Whisper model selection and warm pool
+    WHISPER_MODEL = os.environ.get('WHISPER_MODEL', 'base')
+    WHISPER_DEVICE = os.environ.get('WHISPER_DEVICE', 'auto')
+    WHISPER_PRECISION = os.environ.get('WHISPER_PRECISION', 'fp32')  # 'fp32', 'fp16' (GPU) or 'int8' (CPU)
+    WHISPER_INTRA_OP_THREADS = int(os.environ.get('WHISPER_INTRA_OP_THREADS', 0))  # 0 = torch default (cores / workers in production)
+    WHISPER_INTER_OP_THREADS = int(os.environ.get('WHISPER_INTER_OP_THREADS', 0))  # 0 = torch default
+    WHISPER_ALLOWED_MODELS = os.environ.get('WHISPER_ALLOWED_MODELS', 'tiny,base,small,medium').split(',')
+    WHISPER_MAX_MODELS = int(os.environ.get('WHISPER_MAX_MODELS', 2))
+    WHISPER_MEMORY_BUDGET_MB = int(os.environ.get('WHISPER_MEMORY_BUDGET_MB', 4096))
+
+    # Transcription engine: 'whisper' (openai-whisper, PyTorch) or 'faster-whisper' (CTranslate2; pip install faster-whisper)
+    TRANSCRIPTION_BACKEND = os.environ.get('TRANSCRIPTION_BACKEND', 'whisper')
+    WHISPER_BEAM_SIZE = int(os.environ.get('WHISPER_BEAM_SIZE', 5))  # faster-whisper only
+    FASTER_WHISPER_BATCH_SIZE = int(os.environ.get('FASTER_WHISPER_BATCH_SIZE', 8))  # >1 decodes 30 s windows in batches
+    FASTER_WHISPER_NUM_WORKERS = int(os.environ.get('FASTER_WHISPER_NUM_WORKERS', 1))  # concurrent transcriptions per model
+
+    # Uploads are transcoded once on ingest to 16 kHz mono: 'flac' (lossless), 'opus' or 'none' (keep as uploaded)
+    AUDIO_CANONICAL_FORMAT = os.environ.get('AUDIO_CANONICAL_FORMAT', 'flac')
+    AUDIO_OPUS_BITRATE = os.environ.get('AUDIO_OPUS_BITRATE', '24k')
+    AUDIO_KEEP_ORIGINAL = os.environ.get('AUDIO_KEEP_ORIGINAL', '0') == '1'
+
+    # Voice activity trimming: drop silences longer than VAD_MIN_SILENCE_SECONDS before Whisper
+    VAD_ENABLED = os.environ.get('VAD_ENABLED', '0') == '1'
+    VAD_FRAME_MS = int(os.environ.get('VAD_FRAME_MS', 30))
+    VAD_THRESHOLD_DB = float(os.environ.get('VAD_THRESHOLD_DB', 12))  # above the recording's noise floor
+    VAD_MIN_ENERGY_DB = float(os.environ.get('VAD_MIN_ENERGY_DB', -55))
+    VAD_MIN_SILENCE_SECONDS = float(os.environ.get('VAD_MIN_SILENCE_SECONDS', 1.0))
+    VAD_PAD_SECONDS = float(os.environ.get('VAD_PAD_SECONDS', 0.25))
+    VAD_MIN_KEEP_RATIO = float(os.environ.get('VAD_MIN_KEEP_RATIO', 0.05))  # keep more than this of non-silent audio, else skip trimming
+
+    # Long recordings are cut at silences and transcribed in parallel worker processes (CPU only)
+    PARALLEL_TRANSCRIBE_ENABLED = os.environ.get('PARALLEL_TRANSCRIBE_ENABLED', '0') == '1'
+    PARALLEL_TRANSCRIBE_MIN_SECONDS = float(os.environ.get('PARALLEL_TRANSCRIBE_MIN_SECONDS', 600))
+    PARALLEL_TRANSCRIBE_WORKERS = int(os.environ.get('PARALLEL_TRANSCRIBE_WORKERS', 0))  # per server worker; 0 = CPU cores / SERVER_WORKERS
+    PARALLEL_TRANSCRIBE_CHUNK_SECONDS = float(os.environ.get('PARALLEL_TRANSCRIBE_CHUNK_SECONDS', 120))
+    PARALLEL_TRANSCRIBE_OVERLAP_SECONDS = float(os.environ.get('PARALLEL_TRANSCRIBE_OVERLAP_SECONDS', 2))  # at cuts with no silence
+    PARALLEL_TRANSCRIBE_MIN_GAP_SECONDS = float(os.environ.get('PARALLEL_TRANSCRIBE_MIN_GAP_SECONDS', 0.3))
+
+    # Content-addressed transcript cache, shared with the batch scripts
+    TRANSCRIPT_CACHE_ENABLED = os.environ.get('TRANSCRIPT_CACHE_ENABLED', '1') == '1'
+    TRANSCRIPT_CACHE_DIR = os.environ.get(
+        'TRANSCRIPT_CACHE_DIR',
+        os.path.abspath(os.path.join(os.path.dirname(__file__), 'cache', 'transcripts'))
+    )
+    TRANSCRIPT_CACHE_MAX_MB = int(os.environ.get('TRANSCRIPT_CACHE_MAX_MB', 256))
+
+    # Persistent note cache (transcript hash, model, prompt version, chunking, options)
+    NOTE_CACHE_ENABLED = os.environ.get('NOTE_CACHE_ENABLED', '1') == '1'
+    NOTE_CACHE_DIR = os.environ.get(
+        'NOTE_CACHE_DIR',
+        os.path.abspath(os.path.join(os.path.dirname(__file__), 'cache', 'notes'))
+    )
+    NOTE_CACHE_MAX_MB = int(os.environ.get('NOTE_CACHE_MAX_MB', 64))
+
+    # Note generation strategy ('refine' or 'map_reduce') and map-step concurrency
+    NOTE_STRATEGY = os.environ.get('NOTE_STRATEGY', 'refine')
+    NOTE_MAP_WORKERS = int(os.environ.get('NOTE_MAP_WORKERS', 4))
+
+    # Token-aware transcript chunking. Tokenizer specs: 'tiktoken:<encoding>',
+    # 'hf:<repo or tokenizer.json>' or 'chars:<chars per token>'
+    NOTE_TOKENIZER = os.environ.get('NOTE_TOKENIZER', 'tiktoken:cl100k_base')
+    NOTE_TOKENIZERS = {}  # model name prefix -> tokenizer spec, e.g. {'llama3': 'hf:/models/llama3/tokenizer.json'}
+    NOTE_CONTEXT_WINDOW = int(os.environ.get('NOTE_CONTEXT_WINDOW', 8192))
+    NOTE_OUTPUT_TOKENS = int(os.environ.get('NOTE_OUTPUT_TOKENS', 1024))
+    NOTE_PREVIOUS_NOTE_TOKENS = int(os.environ.get('NOTE_PREVIOUS_NOTE_TOKENS', 1024))
+    NOTE_PROMPT_MARGIN_TOKENS = int(os.environ.get('NOTE_PROMPT_MARGIN_TOKENS', 256))
+    NOTE_MAX_CHUNK_TOKENS = int(os.environ.get('NOTE_MAX_CHUNK_TOKENS', 0))
+    NOTE_MIN_CHUNK_TOKENS = int(os.environ.get('NOTE_MIN_CHUNK_TOKENS', 256))
+    NOTE_CHUNK_OVERLAP_TOKENS = int(os.environ.get('NOTE_CHUNK_OVERLAP_TOKENS', 0))
+    NOTE_INCREMENTAL_PASSES = int(os.environ.get('NOTE_INCREMENTAL_PASSES', 3))  # refine-sized passes one 'incremental' context holds
+
+    # LLM cleaning attempts allowed after local note repair
+    NOTE_CLEAN_MAX_RETRIES = int(os.environ.get('NOTE_CLEAN_MAX_RETRIES', 2))
+
+    # Shared Ollama client layer
+    OLLAMA_HOSTS = os.environ.get('OLLAMA_HOSTS', os.environ.get('OLLAMA_HOST', 'http://localhost:11434')).split(',')
+    OLLAMA_TIMEOUT = float(os.environ.get('OLLAMA_TIMEOUT', 600))
+    OLLAMA_KEEP_ALIVE = os.environ.get('OLLAMA_KEEP_ALIVE', '30m')
+    # num_ctx sent on every call so a model is never reloaded at another size; with the
+    # incremental strategy it is widened so several chunks fit in one carried context
+    OLLAMA_NUM_CTX = int(os.environ.get(
+        'OLLAMA_NUM_CTX',
+        NOTE_CONTEXT_WINDOW * (max(1, NOTE_INCREMENTAL_PASSES) if NOTE_STRATEGY == 'incremental' else 1)
+    ))
+    OLLAMA_MODEL_CONCURRENCY = int(os.environ.get('OLLAMA_MODEL_CONCURRENCY', 2))
+    OLLAMA_MODEL_LIMITS = {}  # model name -> concurrent requests per host, overrides OLLAMA_MODEL_CONCURRENCY
+    OLLAMA_MAX_RETRIES = int(os.environ.get('OLLAMA_MAX_RETRIES', 3))
+    OLLAMA_RETRY_BACKOFF = float(os.environ.get('OLLAMA_RETRY_BACKOFF', 1.0))
+
+    # Upload limits; also applied by Flask to multipart bodies on /process-audio
+    MAX_UPLOAD_BYTES = int(os.environ.get('MAX_UPLOAD_MB', 500)) * 1024 * 1024
+    MAX_CONTENT_LENGTH = MAX_UPLOAD_BYTES
+
+    # Upload folder retention; TTLs count from an artifact's last modification
+    RETENTION_ENABLED = os.environ.get('RETENTION_ENABLED', '1') == '1'
+    RETENTION_AUDIO_TTL_HOURS = float(os.environ.get('RETENTION_AUDIO_TTL_HOURS', 72))
+    RETENTION_TRANSCRIPT_TTL_HOURS = float(os.environ.get('RETENTION_TRANSCRIPT_TTL_HOURS', 72))
+    RETENTION_PARTIAL_TTL_HOURS = float(os.environ.get('RETENTION_PARTIAL_TTL_HOURS', 24))
+    RETENTION_QUOTA_MB = int(os.environ.get('RETENTION_QUOTA_MB', 10240))
+    RETENTION_PIN_MAX_AGE_HOURS = float(os.environ.get('RETENTION_PIN_MAX_AGE_HOURS', 12))  # ignore pins left by crashed jobs
+    RETENTION_SWEEP_INTERVAL = int(os.environ.get('RETENTION_SWEEP_INTERVAL', 300))
@@ -1,6 +1,114 @@
+import argparse
+import gc
+import os
+import tempfile
 from app import create_app
+from config import Config
 
-app = create_app()
+def prepare_metrics_dir():
+    """Point prometheus_client at a fresh multiprocess directory.
 
+    Must run before prometheus_client is imported (create_app imports it) so every
+    worker writes its samples to files that a /metrics scrape of any worker aggregates.
+    """
+    metrics_dir = os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', os.path.join(tempfile.gettempdir(), 'scribe-metrics'))
+    os.makedirs(metrics_dir, exist_ok=True)
+    # Samples left by a previous run would be added to this one's
+    for name in os.listdir(metrics_dir):
+        if name.endswith('.db'):
+            os.remove(os.path.join(metrics_dir, name))
+
+def memory_report(pid=None) -> str:
+    """RSS, plus USS/PSS where the platform reports them; USS is what a worker does not share."""
+    import psutil
+    process = psutil.Process(pid)
+    try:
+        info = process.memory_full_info()
+    except (psutil.AccessDenied, AttributeError):
+        info = process.memory_info()
+    parts = [f"rss {info.rss / 1e6:.0f} MB"]
+    for field in ('uss', 'pss'):
+        if hasattr(info, field):
+            parts.append(f"{field} {getattr(info, field) / 1e6:.0f} MB")
+    return ', '.join(parts)
+
+def preload_whisper():
+    """Load the default Whisper model in the master so forked workers share its weights."""
+    from app.services.transcription_service import TranscriptionService
+    key = TranscriptionService.resolve_model_key()
+    if key[1] != 'cpu':
+        # A CUDA context cannot survive fork; each worker loads its own copy on first use
+        print(f"Not preloading Whisper on {key[1]}; workers will load it lazily")
+        return
+    if key[3] != 'whisper':
+        # CTranslate2's thread pools do not survive fork either
+        print(f"Not preloading the {key[3]} backend; workers will load it lazily")
+        return
+    TranscriptionService.get_model(*key)
+    print(f"Preloaded Whisper {key[0]} ({key[2]}) in master: {memory_report()}")
+
+def run_production(app, bind: str, workers: int, threads: int, timeout: int):
+    """Serve the app with gunicorn: preloaded app and Whisper, forked gthread workers."""
+    from gunicorn.app.base import BaseApplication
+
+    def post_fork(server, worker):
+        from app.services.transcription_service import TranscriptionService
+        # Split the cores between workers so they do not oversubscribe each other
+        TranscriptionService.configure_threads(
+            intra_op=Config.WHISPER_INTRA_OP_THREADS or max(1, (os.cpu_count() or 1) // workers)
+        )
+
+    def post_worker_init(worker):
+        print(f"Worker {worker.pid} ready: {memory_report()}")
+
+    def child_exit(server, worker):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
+
+    def when_ready(server):
+        print(f"Master {os.getpid()} ready: {memory_report()}")
+
+    class ProductionApplication(BaseApplication):
+        def load_config(self):
+            settings = {
+                'bind': bind,
+                'workers': workers,
+                'threads': threads,
+                'worker_class': 'gthread',
+                'timeout': timeout,
+                'preload_app': True,
+                'post_fork': post_fork,
+                'post_worker_init': post_worker_init,
+                'child_exit': child_exit,
+                'when_ready': when_ready
+            }
+            for name, value in settings.items():
+                self.cfg.set(name, value)
+
+        def load(self):
+            return app
+
+    if Config.SERVER_PRELOAD_WHISPER:
+        preload_whisper()
+    # Keep the preloaded objects out of the GC's generations so collections in
+    # the workers do not touch (and un-share) their pages
+    gc.freeze()
+    ProductionApplication().run()
+
+# Only under __main__: the long-audio pool's spawned workers re-import this module
+# as __mp_main__ and must not create another app (and retention sweeper) or clear
+# the metrics files of the running server
 if __name__ == '__main__':
-    app.run(debug=True) 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Run the medical scribe server")
+    parser.add_argument("--production", action="store_true", help="Serve with gunicorn instead of the Flask dev server")
+    parser.add_argument("--bind", default=Config.SERVER_BIND, help="Address to listen on (production mode)")
+    parser.add_argument("--workers", type=int, default=Config.SERVER_WORKERS, help="Worker processes (production mode)")
+    parser.add_argument("--threads", type=int, default=Config.SERVER_THREADS, help="Threads per worker (production mode)")
+    parser.add_argument("--timeout", type=int, default=Config.SERVER_TIMEOUT, help="Worker timeout in seconds (production mode)")
+    args = parser.parse_args()
+
+    if args.production:
+        prepare_metrics_dir()
+        run_production(create_app(), args.bind, args.workers, args.threads, args.timeout)
+    else:
+        create_app().run(debug=True)
@@ -1,8 +1,12 @@
 import os
+import time
 from pathlib import Path
+from typing import Dict, List, Tuple
 import sys
 sys.path.append(os.path.join(os.path.dirname(__file__), "../medical_scribe"))
+from config import Config
 from app.services.note_generation_service import NoteGenerationService
+from app.services.ollama_client import OllamaClient
 
 # Models to use for generation
 MODELS = [
@@ -17,54 +21,101 @@ MODELS = [
     "mistral-small3.1:24b"
 ]
 
-def process_transcription_file(file_path: Path, output_base_path: Path) -> None:
-    """Process a single transcription file and generate clinical notes for all models."""
-    try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            transcription = f.read()
-        
+def plan_tasks(transcription_files: List[Path], output_base_path: Path) -> Dict[str, List[Tuple[Path, Path]]]:
+    """Plan the full (transcript x model) workload, grouped by model.
+
+    Returns a mapping of model -> [(transcription file, output file)] in MODELS
+    order, skipping notes that already exist.
+    """
+    queues = {model: [] for model in MODELS}
+    for file_path in transcription_files:
         # Get the pathology and visit type from the directory structure
         pathology = file_path.parent.name
         visit_type = file_path.parent.parent.name
-        
-        # Create output directory structure
         output_path = output_base_path / visit_type / pathology
-        output_path.mkdir(parents=True, exist_ok=True)
-        
-        # Generate clinical notes for each model
+
         for model in MODELS:
             # Create model-specific output filename
             model_name = model.replace(":", "_")
             output_file = output_path / f"{file_path.stem}_{model_name}.txt"
-            
+
             # Skip if the file already exists
             if output_file.exists():
                 print(f"Skipping {output_file} - already exists")
                 continue
-                
+            queues[model].append((file_path, output_file))
+    return queues
+
+def load_model(model: str) -> float:
+    """Load a model into Ollama memory ahead of its queue and return the load time in seconds."""
+    started = time.perf_counter()
+    # Load at the window the notes run with, or the first note would reload the model
+    response = OllamaClient.generate(model=model, prompt='', options={'num_ctx': Config.OLLAMA_NUM_CTX})
+    elapsed = time.perf_counter() - started
+    # Ollama reports the load time itself in nanoseconds; prefer it when present
+    load_duration = response.get('load_duration')
+    return load_duration / 1e9 if load_duration else elapsed
+
+def unload_model(model: str):
+    """Release a model's memory once its queue has drained."""
+    try:
+        OllamaClient.generate(model=model, prompt='', keep_alive=0)
+    except Exception as e:
+        print(f"Error unloading {model}: {e}")
+
+def process_model_queue(model: str, tasks: List[Tuple[Path, Path]]) -> dict:
+    """Generate every queued note for one model while it stays resident."""
+    stats = {'model': model, 'notes': 0, 'failed': 0, 'load_s': 0.0, 'generation_s': 0.0}
+
+    try:
+        stats['load_s'] = load_model(model)
+        print(f"Loaded {model} in {stats['load_s']:.1f}s")
+    except Exception as e:
+        print(f"Error loading {model}: {e}")
+
+    for file_path, output_file in tasks:
+        try:
+            with open(file_path, 'r', encoding='utf-8') as f:
+                transcription = f.read()
+
             print(f"Generating clinical note for {file_path} using {model}")
+            started = time.perf_counter()
             # Generate complete clinical note
             clinical_note = NoteGenerationService.generate_note_from_transcript(
                 transcript=transcription,
                 model=model
             )
-            
+            stats['generation_s'] += time.perf_counter() - started
+
             # Save final clinical note
+            output_file.parent.mkdir(parents=True, exist_ok=True)
             with open(output_file, 'w', encoding='utf-8') as f:
                 f.write(clinical_note)
+            stats['notes'] += 1
             print(f"Saved to: {output_file}")
+        except Exception as e:
+            stats['failed'] += 1
+            print(f"Error processing {file_path}: {e}")
 
-                
-    except Exception as e:
-        print(f"Error processing {file_path}: {e}")
+    unload_model(model)
+    return stats
+
+def print_summary(all_stats: List[dict]):
+    print("\nModel scheduling summary:")
+    print(f"{'model':<24}{'notes':>7}{'failed':>8}{'load s':>10}{'gen s':>10}{'load %':>9}")
+    for stats in all_stats:
+        total = stats['load_s'] + stats['generation_s']
+        load_share = 100 * stats['load_s'] / total if total else 0
+        print(f"{stats['model']:<24}{stats['notes']:>7}{stats['failed']:>8}"
+              f"{stats['load_s']:>10.1f}{stats['generation_s']:>10.1f}{load_share:>8.1f}%")
 
 def main():
     interviews_path = Path("interviews/data")
     notes_path = Path("notes/data")
-    
+
     # Create notes data directory if it doesn't exist
     notes_path.mkdir(parents=True, exist_ok=True)
-    
+
     # Get all transcription files and sort them
     print(f"Looking for files in {interviews_path}")
     transcription_files = []
@@ -73,14 +124,20 @@ def main():
             if file.endswith('.txt'):
                 file_path = Path(root) / file
                 transcription_files.append(file_path)
-    
+
     # Sort files by path
     transcription_files.sort()
-    
-    # Process files in sorted order
-    for file_path in transcription_files:
-        print(f"Processing {file_path.name}")
-        process_transcription_file(file_path, notes_path)
+
+    # Run the workload model by model so each model is loaded once
+    queues = plan_tasks(transcription_files, notes_path)
+    all_stats = []
+    for model, tasks in queues.items():
+        if not tasks:
+            continue
+        print(f"\nProcessing {len(tasks)} transcripts with {model}")
+        all_stats.append(process_model_queue(model, tasks))
+
+    print_summary(all_stats)
 
 if __name__ == "__main__":
     main()